@@ -0,0 +1,319 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+from .profiling import (QUERY_BUCKETS, after_response, execute_wrappers,
+                        get_view_name)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Сумма значений завершившихся процессов и блокировка для ее обновления.
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = 'metrics.lock'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'foodgram_http_requests_total': (
+        'counter', 'Обработанные HTTP-запросы'),
+    'foodgram_http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса'),
+    'foodgram_db_queries_total': (
+        'counter', 'SQL-запросы при обработке HTTP-запросов'),
+    'foodgram_db_queries_per_request': (
+        'histogram', 'Число SQL-запросов на HTTP-запрос'),
+    'foodgram_cache_requests_total': (
+        'counter', 'Обращения к кешам приложения по результату'),
+}
+
+
+def encode_labels(labels):
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_snapshot(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        counters[(name, labels)] += value
+    for name, labels, histogram in data['histograms']:
+        total = histograms.setdefault((name, labels), {
+            'buckets': histogram['buckets'],
+            'counts': [0] * len(histogram['counts']),
+            'sum': 0.0,
+        })
+        for position, count in enumerate(histogram['counts']):
+            total['counts'][position] += count
+        total['sum'] += histogram['sum']
+
+
+class MetricsStore:
+    """Счетчики и гистограммы процесса с выгрузкой в файл.
+
+    Каждый процесс gunicorn пишет файл {pid}-{запуск}.json в METRICS_DIR
+    не чаще раза в METRICS_FLUSH_INTERVAL секунд, /metrics суммирует
+    все файлы. Файлы завершившихся процессов при этом переносятся в
+    retired.json, поэтому суммы не уменьшаются и файлы не копятся.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        # Отличает файл от файла прежнего процесса с тем же pid.
+        self.started = time.time_ns()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed = 0.0
+
+    @property
+    def directory(self):
+        return settings.METRICS_DIR
+
+    @property
+    def file_name(self):
+        return f'{self.pid}-{self.started}.json'
+
+    def check_pid(self):
+        # После fork дочерний процесс не должен повторно выгружать
+        # значения, накопленные родителем.
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.check_pid()
+            self.counters[(name, encode_labels(labels))] += value
+        self.flush()
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            self.check_pid()
+            key = (name, encode_labels(labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * (len(buckets) + 1),
+                    'sum': 0.0,
+                }
+            histogram['counts'][bisect_left(buckets, value)] += 1
+            histogram['sum'] += value
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, labels, dict(histogram,
+                                        counts=list(histogram['counts']))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def write(self, file_name, data):
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory,
+                                                 suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(data, file)
+        os.replace(temp_path, os.path.join(self.directory, file_name))
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        os.makedirs(self.directory, exist_ok=True)
+        self.check_pid()
+        self.write(self.file_name, self.snapshot())
+
+    def dead_files(self, file_names):
+        """Файлы процессов, которых больше нет.
+
+        Из нескольких файлов одного pid живым может быть только
+        последний запущенный.
+        """
+        latest = {}
+        dead = []
+        for file_name in file_names:
+            pid, _, started = file_name[:-len('.json')].partition('-')
+            if not (pid.isdigit() and started.isdigit()):
+                continue
+            key = (int(started), file_name)
+            previous = latest.get(int(pid))
+            if previous is None or previous < key:
+                if previous is not None:
+                    dead.append(previous[1])
+                latest[int(pid)] = key
+            else:
+                dead.append(file_name)
+        dead.extend(
+            file_name for pid, (_, file_name) in latest.items()
+            if pid != self.pid and not is_alive(pid)
+        )
+        return dead
+
+    def collect(self):
+        """Сумма значений всех процессов, включая текущий и завершенные."""
+        self.flush(force=True)
+        counters = defaultdict(float)
+        histograms = {}
+        with open(os.path.join(self.directory, LOCK_FILE), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            file_names = [
+                file_name for file_name in os.listdir(self.directory)
+                if file_name.endswith('.json') and file_name != RETIRED_FILE
+            ]
+            dead = self.dead_files(file_names)
+            retired = read_snapshot(os.path.join(self.directory,
+                                                 RETIRED_FILE))
+            if retired is not None:
+                merge_snapshot(counters, histograms, retired)
+            if dead:
+                for file_name in dead:
+                    data = read_snapshot(os.path.join(self.directory,
+                                                      file_name))
+                    if data is not None:
+                        merge_snapshot(counters, histograms, data)
+                self.write(RETIRED_FILE, {
+                    'counters': [[name, labels, value] for (name, labels),
+                                 value in counters.items()],
+                    'histograms': [[name, labels, histogram] for
+                                   (name, labels), histogram in
+                                   histograms.items()],
+                })
+                for file_name in dead:
+                    os.remove(os.path.join(self.directory, file_name))
+            for file_name in set(file_names) - set(dead):
+                data = read_snapshot(os.path.join(self.directory, file_name))
+                if data is not None:
+                    merge_snapshot(counters, histograms, data)
+        return counters, histograms
+
+
+metrics = MetricsStore()
+
+
+def count_cache(cache_name, hit):
+    if settings.METRICS_ENABLED:
+        metrics.inc('foodgram_cache_requests_total',
+                    {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+def render_metrics():
+    counters, histograms = metrics.collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(
+                    f'{name}{format_labels(json.loads(labels))} {value:g}'
+                )
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            labels = json.loads(labels)
+            cumulative = 0
+            bounds = [*map(str, histogram['buckets']), '+Inf']
+            for bound, count in zip(bounds, histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{format_labels([*labels, ["le", bound]])} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} '
+                         f'{histogram["sum"]:g}')
+            lines.append(f'{name}_count{format_labels(labels)} '
+                         f'{cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Задержка и число SQL-запросов по представлениям для /metrics."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with execute_wrappers(counter):
+            response = self.get_response(request)
+        after_response(response, counter, lambda: self.record(
+            request, response, counter, time.perf_counter() - started
+        ))
+        return response
+
+    def record(self, request, response, counter, duration):
+        view = get_view_name(request)
+        if view == 'metrics':
+            return
+        metrics.observe('foodgram_http_request_duration_seconds',
+                        {'view': view}, duration, LATENCY_BUCKETS)
+        metrics.observe('foodgram_db_queries_per_request',
+                        {'view': view}, counter.count, QUERY_BUCKETS)
+        metrics.inc('foodgram_db_queries_total', {'view': view},
+                    counter.count)
+        metrics.inc('foodgram_http_requests_total', {
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+        })
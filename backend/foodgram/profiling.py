@@ -0,0 +1,290 @@
+import logging
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+TOP_FINGERPRINTS = 10
+FINGERPRINT_LENGTH = 300
+
+LITERALS = re.compile(r"%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'IN \(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+local = threading.local()
+
+
+def fingerprint(sql):
+    """Текст запроса без литералов: одинаков для запросов N+1."""
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.serializers = defaultdict(float)
+        self.depth = Counter()
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self):
+        threshold = settings.PROFILING_REPEAT_THRESHOLD
+        return {
+            sql: count for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        }
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+
+def profile_serializer(to_representation):
+    def wrapper(self, instance):
+        profile = getattr(local, 'profile', None)
+        if profile is None:
+            return to_representation(self, instance)
+        if isinstance(self, serializers.ListSerializer):
+            name = f'{type(self.child).__name__}.many'
+        else:
+            name = type(self).__name__
+        # Вложенный вызов того же класса уже учтен во внешнем.
+        profile.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            profile.depth[name] -= 1
+            if not profile.depth[name]:
+                profile.serializers[name] += time.perf_counter() - started
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_serializer_timing():
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.to_representation, 'profiled', False):
+            cls.to_representation = profile_serializer(cls.to_representation)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        labels = [f'<={bucket}' for bucket in self.buckets] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': sum(self.counts),
+            'sum': round(self.total, 3),
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = 0.0
+        self.serializers = defaultdict(float)
+        self.repeated = Counter()
+
+    def add(self, profile):
+        self.latency.observe(profile.duration * 1000)
+        self.queries.observe(profile.sql_count)
+        self.sql_time += profile.sql_time * 1000
+        for name, seconds in profile.serializers.items():
+            self.serializers[name] += seconds * 1000
+        self.repeated.update(
+            sql[:FINGERPRINT_LENGTH] for sql in profile.repeated()
+        )
+
+    def as_dict(self):
+        return {
+            'latency_ms': self.latency.as_dict(),
+            'queries': self.queries.as_dict(),
+            'sql_ms': round(self.sql_time, 3),
+            'serializers_ms': {
+                name: round(total, 3)
+                for name, total in sorted(self.serializers.items())
+            },
+            'repeated_queries': dict(
+                self.repeated.most_common(TOP_FINGERPRINTS)
+            ),
+        }
+
+
+class ProfileStats:
+    """Агрегаты профилирования по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self.views = defaultdict(ViewStats)
+        self.lock = threading.Lock()
+
+    def add(self, view_name, profile):
+        with self.lock:
+            self.views[view_name].add(profile)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                name: stats.as_dict()
+                for name, stats in sorted(self.views.items())
+            }
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+profile_stats = ProfileStats()
+
+
+@contextmanager
+def execute_wrappers(wrapper):
+    """Подключает обертку SQL-запросов ко всем соединениям."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+class ObservedStream:
+    """Тело потокового ответа, запросы которого видит wrapper.
+
+    Тело читается уже после выхода из middleware, поэтому итоги
+    подводит callback в конце тела или, если клиент отключился раньше,
+    когда сервер закрывает ответ. Ошибки close() Django подавляет.
+    """
+
+    def __init__(self, content, wrapper, callback):
+        self.content = content
+        self.wrapper = wrapper
+        self.callback = callback
+        self.closed = False
+
+    def __iter__(self):
+        with execute_wrappers(self.wrapper):
+            yield from self.content
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.callback()
+
+
+def after_response(response, wrapper, callback):
+    """Вызывает callback, когда ответ, в том числе потоковый, отдан."""
+    if response.streaming:
+        response.streaming_content = ObservedStream(
+            response.streaming_content, wrapper, callback
+        )
+    else:
+        callback()
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class ProfilingMiddleware:
+    """Профилирование доли запросов, включается PROFILING_ENABLED.
+
+    Для выбранного запроса считает SQL-запросы и их время, повторяющиеся
+    запросы и время сериализаторов, пишет в лог, добавляет заголовок
+    Server-Timing и накапливает гистограммы по представлениям.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = RequestProfile()
+        local.profile = profile
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            local.profile = None
+        profile.finish()
+        view_name = get_view_name(request)
+        profile_stats.add(view_name, profile)
+        self.log(request, response, view_name, profile)
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(profile)
+        return response
+
+    def server_timing(self, profile):
+        metrics = [
+            f'total;dur={profile.duration * 1000:.1f}',
+            f'sql;dur={profile.sql_time * 1000:.1f};'
+            f'desc="{profile.sql_count} queries"',
+        ]
+        metrics.extend(
+            f'ser-{name};dur={seconds * 1000:.1f}'
+            for name, seconds in profile.serializers.items()
+        )
+        return ', '.join(metrics)
+
+    def log(self, request, response, view_name, profile):
+        repeated = profile.repeated()
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            '%s %s %s %s %.1fms sql=%d/%.1fms repeated=%s serializers=%s',
+            request.method, request.path, view_name, response.status_code,
+            profile.duration * 1000, profile.sql_count,
+            profile.sql_time * 1000,
+            sorted(repeated.values(), reverse=True),
+            {name: round(seconds * 1000, 1)
+             for name, seconds in profile.serializers.items()},
+        )
+
+
+class ProfilingStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(profile_stats.as_dict())
+
+    def delete(self, request):
+        profile_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
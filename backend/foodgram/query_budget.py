@@ -0,0 +1,140 @@
+import logging
+import os
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .profiling import (FINGERPRINT_LENGTH, after_response, execute_wrappers,
+                        fingerprint, get_view_name)
+
+logger = logging.getLogger(__name__)
+
+# Наибольшее число SQL-запросов на запрос к представлению при прогретом
+# кеше. Не должно зависеть от размера страницы и числа вложенных объектов.
+BUDGETS = {
+    'recipes-list': 6,
+    'recipes-detail': 5,
+    'recipes-download-shopping-cart': 2,
+    'recipes-feed': 5,
+    'subscription': 4,
+    'user-list': 3,
+    'user-detail': 2,
+    'user-me': 1,
+    'ingredients-list': 2,
+    'tags-list': 1,
+}
+
+# Здесь обертки execute_wrapper, запросы отсюда не выполняются.
+WRAPPERS_PATH = os.path.dirname(__file__)
+DJANGO_PATH = os.path.dirname(django.__file__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_call_site():
+    """Ближайший к запросу кадр кода проекта: файл, строка, функция.
+
+    Если запрос целиком выполняется библиотекой, например при
+    аутентификации, берется ближайший кадр вне Django.
+    """
+    fallback = 'unknown'
+    for frame, lineno in traceback.walk_stack(None):
+        filename = frame.f_code.co_filename
+        if filename.startswith((WRAPPERS_PATH, DJANGO_PATH)):
+            continue
+        site = f'{{path}}:{lineno} ({frame.f_code.co_name})'
+        if 'site-packages' not in filename and filename.startswith(
+                str(settings.BASE_DIR)):
+            return site.format(
+                path=os.path.relpath(filename, settings.BASE_DIR)
+            )
+        if fallback == 'unknown':
+            fallback = site.format(
+                path=filename.rpartition('site-packages' + os.sep)[2]
+            )
+    return fallback
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[(get_call_site(), fingerprint(sql))] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.queries.values())
+
+    def report(self):
+        """Запросы, сгруппированные по месту вызова."""
+        sites = {}
+        for (site, sql), count in self.queries.most_common():
+            sites.setdefault(site, []).append(
+                f'    {count} x {sql[:FINGERPRINT_LENGTH]}'
+            )
+        return '\n'.join(
+            f'  {site}\n' + '\n'.join(lines) for site, lines in sites.items()
+        )
+
+
+def check_budget(view_name, recorder):
+    """Текст ошибки, если представление вышло за бюджет, иначе None."""
+    budget = BUDGETS.get(view_name)
+    if budget is None or recorder.count <= budget:
+        return None
+    return (f'{view_name}: {recorder.count} SQL-запросов при бюджете '
+            f'{budget}\n{recorder.report()}')
+
+
+@contextmanager
+def record_queries():
+    with execute_wrappers(QueryRecorder()) as recorder:
+        yield recorder
+
+
+@contextmanager
+def query_budget(view_name):
+    """Проверка бюджета в тестах.
+
+        with query_budget('recipes-list'):
+            client.get('/api/recipes/')
+    """
+    with record_queries() as recorder:
+        yield recorder
+    error = check_budget(view_name, recorder)
+    if error:
+        raise QueryBudgetExceeded(error)
+
+
+class QueryBudgetMiddleware:
+    """Проверка бюджетов при разработке, режим задает QUERY_BUDGET_MODE.
+
+    warn пишет превышение в лог, fail возвращает ошибку сервера.
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_MODE not in ('warn', 'fail'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        after_response(response, recorder,
+                       lambda: self.check(request, recorder))
+        return response
+
+    def check(self, request, recorder):
+        error = check_budget(get_view_name(request), recorder)
+        if error:
+            if settings.QUERY_BUDGET_MODE == 'fail':
+                raise QueryBudgetExceeded(error)
+            logger.warning(error)
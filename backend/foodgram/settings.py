@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,6 +30,9 @@ AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.metrics.MetricsMiddleware',
+    'foodgram.profiling.ProfilingMiddleware',
+    'foodgram.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +73,40 @@ DATABASES = {
     }
 }
 
+# Версии данных и собранные списки покупок общие для всех процессов
+# gunicorn, поэтому по умолчанию лежат в файлах.
+SHARED_CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND',
+    default='django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHE_LOCATION = os.environ.get(
+    'CACHE_LOCATION',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+)
+
+# По умолчанию Django держит 300 записей и при переполнении удаляет
+# треть из них. В versions лежат версии каждого рецепта, списка покупок,
+# множеств членства и справочников, поэтому лимит должен покрывать их
+# все, иначе кеши постоянно сбрасываются сами. Для больших баз лучше
+# задать CACHE_BACKEND с общим сервером, например Redis или memcached.
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', default=1000000))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versions': {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': os.path.join(CACHE_LOCATION, 'versions'),
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'shopping_cart': {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': os.path.join(CACHE_LOCATION, 'shopping_cart'),
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib'
@@ -135,3 +173,61 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/mediafiles/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_PIPELINE_BACKEND = os.getenv(
+    'IMAGE_PIPELINE_BACKEND',
+    default='recipes.images.ThreadPoolBackend'
+)
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', default=2))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+MEMBERSHIP_BACKEND = os.getenv(
+    'MEMBERSHIP_BACKEND',
+    default='recipes.membership.LocalMembershipBackend'
+)
+MEMBERSHIP_REDIS_URL = os.getenv('MEMBERSHIP_REDIS_URL', default='')
+
+RECIPE_PAGE_CACHE_SIZE = int(os.getenv('RECIPE_PAGE_CACHE_SIZE', default=1000))
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='false') == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0.1))
+PROFILING_SERVER_TIMING = True
+PROFILING_REPEAT_THRESHOLD = 3
+
+# off, warn или fail: проверка бюджетов SQL-запросов при разработке.
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', default='off')
+
+# /metrics не проксируется nginx: Prometheus опрашивает web:8000/metrics
+# из внутренней сети docker.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='false') == 'true'
+# Каталог файлов со значениями метрик процессов gunicorn, очищается
+# перед запуском.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'foodgram_metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+
+# С этого числа подписок лента хранится в FeedEntry и заполняется при
+# создании рецептов, 0 отключает хранимые ленты.
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', default=200))
+FEED_SIZE = int(os.getenv('FEED_SIZE', default=500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.profiling': {'handlers': ['console'], 'level': 'INFO'},
+        'foodgram.query_budget': {
+            'handlers': ['console'], 'level': 'WARNING'
+        },
+    },
+}
@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+from .profiling import ProfilingStatsView
+
 api_patterns = [
+    path('profiling/', ProfilingStatsView.as_view(), name='profiling'),
     path('', include('recipes.urls')),
     path('', include('users.urls'))
 ]
@@ -9,5 +13,6 @@ api_patterns = [
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(api_patterns)),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
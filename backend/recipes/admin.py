@@ -30,8 +30,10 @@ class AdminRecipe(admin.ModelAdmin):
     list_filter = ['name', 'author', 'tags']
     inlines = (RecipeIngredientsInline, RecipeTagsInline)
 
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def in_favorite(self, obj):
-        return obj.in_favorite.all().count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
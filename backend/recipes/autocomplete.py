@@ -0,0 +1,88 @@
+import threading
+from bisect import bisect_left
+
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Ingredient
+from .reference_cache import get_model_version
+
+AUTOCOMPLETE_LIMIT = 20
+MAX_AUTOCOMPLETE_LIMIT = 100
+
+
+def get_autocomplete_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return AUTOCOMPLETE_LIMIT
+    return min(max(limit, 1), MAX_AUTOCOMPLETE_LIMIT)
+
+
+class IngredientPrefixIndex:
+    """Отсортированный по названию список ингредиентов для SQLite.
+
+    Индекс перестраивается, когда меняется версия модели в общем кеше,
+    поэтому изменения видны во всех процессах.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.names = []
+        self.ids = []
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_model_version(Ingredient)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            rows = sorted(
+                (name.casefold(), pk)
+                for pk, name in Ingredient.objects.order_by().values_list(
+                    'pk', 'name'
+                ).iterator()
+            )
+            self.names = [name for name, _ in rows]
+            self.ids = [pk for _, pk in rows]
+            self.version = version
+
+    def search(self, value, limit):
+        self.refresh()
+        names, ids = self.names, self.ids
+        value = value.casefold()
+        result = []
+        position = bisect_left(names, value)
+        while (position < len(names) and len(result) < limit
+               and names[position].startswith(value)):
+            result.append(ids[position])
+            position += 1
+        if len(result) < limit:
+            for name, pk in zip(names, ids):
+                if value in name and not name.startswith(value):
+                    result.append(pk)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+def rank_by_prefix(queryset, value):
+    return queryset.filter(name__icontains=value).annotate(
+        rank=Case(
+            When(name__istartswith=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('rank', 'name')
+
+
+def order_by_ids(queryset, ids):
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
@@ -0,0 +1,80 @@
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from foodgram.metrics import QueryCounter
+
+COMPARED = ('p50', 'p95', 'p99', 'queries')
+# Слова для названий и описаний синтетических рецептов и поисковых запросов.
+WORDS = ('быстрый', 'домашний', 'летний', 'острый', 'сытный', 'пряный',
+         'нежный', 'праздничный', 'постный', 'классический')
+# Рост p95 меньше этого значения считается шумом измерений.
+NOISE_MS = 2
+
+
+def summarize(timings, queries):
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'runs': len(timings),
+        'p50': round(quantiles[49], 3),
+        'p95': round(quantiles[94], 3),
+        'p99': round(quantiles[98], 3),
+        # Медиана не зависит от числа прогонов: первые вызовы с холодным
+        # кешем делают больше запросов.
+        'queries': statistics.median(queries),
+    }
+
+
+def measure(func, runs):
+    """Время вызовов func в миллисекундах и число SQL-запросов."""
+    timings = []
+    queries = []
+    for number in range(max(runs, 2)):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            started = time.perf_counter()
+            func(number)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+    return summarize(timings, queries)
+
+
+def format_result(name, result):
+    return (f'{name:40} p50 {result["p50"]:8.2f}  '
+            f'p95 {result["p95"]:8.2f}  p99 {result["p99"]:8.2f} мс  '
+            f'запросов {result["queries"]:g}')
+
+
+def compare(results, baseline, tolerance=None):
+    """Сравнение с сохраненными результатами.
+
+    Возвращает строки отчета и список регрессий: стало больше запросов
+    к базе или, если задан tolerance, p95 выросло больше, чем на
+    tolerance и NOISE_MS. Время зависит от машины, поэтому без
+    tolerance сравнивается только число запросов.
+    """
+    lines = []
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            lines.append(f'{name}: нет в базовых результатах')
+            continue
+        changes = []
+        for field in COMPARED:
+            if previous[field]:
+                change = (result[field] / previous[field] - 1) * 100
+                changes.append(f'{field} {change:+.1f}%')
+            else:
+                changes.append(f'{field} {previous[field]} -> {result[field]}')
+        lines.append(f'{name}: ' + ', '.join(changes))
+        slower = tolerance is not None and result['p95'] > max(
+            previous['p95'] * (1 + tolerance), previous['p95'] + NOISE_MS
+        )
+        if slower or result['queries'] > previous['queries']:
+            regressions.append(name)
+    return lines, regressions
@@ -0,0 +1,55 @@
+from django.core.cache import caches
+from django.db.models import F, Sum
+
+from foodgram.metrics import count_cache
+
+from .models import RecipeIngredient, ShoppingList
+from .units import canonical_unit, unit_factor
+from .versions import bump_versions, get_version
+
+CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+CART_KEY = 'shopping_cart_items:{user_id}:{version}'
+
+
+def get_cart_version(user_id):
+    return get_version(CART_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_cart_version(*user_ids):
+    bump_versions(*(
+        CART_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids)
+    ))
+
+
+def bump_recipe_carts(recipe_ids):
+    bump_cart_version(*ShoppingList.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True))
+
+
+def aggregate_cart(user_id):
+    unit = 'ingredient__measurement_unit'
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user_id=user_id
+    ).values(
+        name=F('ingredient__name'),
+        measurement_unit=canonical_unit(unit),
+    ).annotate(
+        amount=Sum(F('amount') * unit_factor(unit))
+    ).order_by('name', 'measurement_unit')
+
+
+def get_shopping_cart(user_id):
+    """Список покупок из кеша: сводка и скачивание файла.
+
+    В списке не больше строки на ингредиент, поэтому он занимает мало
+    памяти, а файл из него все равно отдается потоком.
+    """
+    cache = caches['shopping_cart']
+    key = CART_KEY.format(user_id=user_id, version=get_cart_version(user_id))
+    ingredients = cache.get(key)
+    count_cache('shopping_cart', hit=ingredients is not None)
+    if ingredients is None:
+        ingredients = list(aggregate_cart(user_id))
+        cache.set(key, ingredients)
+    return ingredients
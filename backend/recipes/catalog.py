@@ -0,0 +1,372 @@
+import csv
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from users.counters import count_of
+
+from .feed import rebuild_follower_feeds
+from .models import (Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag,
+                     prefetch_recipe_relations)
+from .page_cache import invalidate_recipe_pages
+from .reference_cache import bump_model_version
+from .search import get_recipe_search
+from .serializers import ShowRecipeFullSerializer
+
+User = get_user_model()
+
+FORMATS = ('json', 'ndjson', 'csv')
+NDJSON_CONTENT_TYPE = 'application/x-ndjson; charset=utf-8'
+READ_SIZE = 64 * 1024
+# Столько символов занимает оборванный литерал, число или \uXXXX.
+TRUNCATED_TAIL = 8
+EXPORT_BATCH_SIZE = 500
+USER_SECTIONS = ('recipes', 'favorites', 'shopping_cart')
+TAG_FIELDS = ('name', 'color', 'slug')
+SEPARATORS = re.compile(r'[\s,]*')
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+RECIPE_NAME_LENGTH = Recipe._meta.get_field('name').max_length
+COOKING_TIME_VALIDATORS = Recipe._meta.get_field('cooking_time').validators
+
+
+def is_truncated(error):
+    """Ошибка из-за конца прочитанного куска, а не из-за синтаксиса."""
+    return (error.msg.startswith('Unterminated string')
+            or len(error.doc) - error.pos <= TRUNCATED_TAIL)
+
+
+def read_json_array(file):
+    """Объекты JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            # Объект еще не прочитан целиком, ошибку в середине куска
+            # дочитывание файла не исправит.
+            if not is_truncated(error):
+                raise
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield record
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        if row.get('ingredients'):
+            row['ingredients'] = json.loads(row['ingredients'])
+        if row.get('tags'):
+            row['tags'] = row['tags'].split(';')
+        yield row
+
+
+READERS = {'json': read_json_array, 'ndjson': read_ndjson, 'csv': read_csv}
+
+
+def guess_format(path):
+    extension = path.rpartition('.')[2].lower()
+    return {'jsonl': 'ndjson'}.get(extension, extension)
+
+
+def normalize(record):
+    """Поля записи, в том числе из фикстур вида {"model", "fields"}."""
+    if 'fields' in record:
+        record = record['fields']
+    return record
+
+
+def dump_line(section, data):
+    return json.dumps({'section': section, **data}, ensure_ascii=False) + '\n'
+
+
+def in_batches(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Списки объектов из iterator(), без загрузки всей выборки."""
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_recipes(section, queryset, context, batch_size=EXPORT_BATCH_SIZE):
+    """Рецепты в виде ShowRecipeFullSerializer, строка NDJSON на рецепт.
+
+    iterator() не выполняет prefetch_related, поэтому связи загружаются
+    отдельно для каждой пачки. image_path позволяет загрузить строку
+    обратно через import_catalog.
+    """
+    for batch in in_batches(queryset.order_by('id'), batch_size):
+        prefetch_recipe_relations(batch)
+        serializer = ShowRecipeFullSerializer(batch, many=True,
+                                              context=context)
+        for recipe, data in zip(batch, serializer.data):
+            yield dump_line(section, dict(data, image_path=recipe.image.name))
+
+
+def export_user_data(request, sections=USER_SECTIONS):
+    user = request.user
+    querysets = {
+        'recipes': Recipe.objects.filter(author=user),
+        'favorites': Recipe.objects.favorited_by(user),
+        'shopping_cart': Recipe.objects.in_cart_of(user),
+    }
+    for section in sections:
+        yield from export_recipes(section, querysets[section],
+                                  {'request': request})
+
+
+def export_catalog(batch_size=EXPORT_BATCH_SIZE):
+    """Теги, ингредиенты и рецепты для резервной копии."""
+    for section, queryset in (
+        ('tags', Tag.objects.values(*TAG_FIELDS)),
+        ('ingredients', Ingredient.objects.values('name',
+                                                  'measurement_unit')),
+    ):
+        for data in queryset.order_by('id').iterator(chunk_size=batch_size):
+            yield dump_line(section, data)
+    yield from export_recipes('recipes', Recipe.objects.all(), {},
+                              batch_size)
+
+
+def get_image_path(record):
+    """Путь к фото в хранилище, ссылки из ответов API не подходят."""
+    path = record.get('image_path') or record.get('image') or ''
+    if '://' in path or path.startswith('/'):
+        return ''
+    return path
+
+
+def ingredient_key(record):
+    name = str(record.get('name') or '').strip()
+    unit = str(record.get('measurement_unit') or '').strip()
+    if not name or len(name) > NAME_LENGTH or len(unit) > UNIT_LENGTH:
+        return None
+    return name, unit
+
+
+class CatalogImporter:
+    """Пакетная загрузка ингредиентов и рецептов.
+
+    Ингредиенты определяются по названию и единице измерения, рецепты
+    по названию. Уже существующие записи пропускаются, поэтому повторная
+    загрузка того же файла ничего не меняет.
+    """
+
+    def __init__(self, default_author=None):
+        self.default_author = default_author
+        self.ingredient_ids = {}
+        self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        self.author_ids = {}
+        self.stats = dict.fromkeys(
+            ('read', 'tags', 'ingredients', 'recipes', 'skipped', 'rejected'),
+            0
+        )
+        self.recipe_ids = []
+        self.changed_authors = set()
+
+    def add_batch(self, records):
+        tags = []
+        ingredients = []
+        recipes = []
+        for record in records:
+            self.stats['read'] += 1
+            if not isinstance(record, dict):
+                self.stats['rejected'] += 1
+                continue
+            record = normalize(record)
+            if record.get('section') == 'tags':
+                tags.append(record)
+            elif 'ingredients' in record:
+                recipes.append(record)
+            else:
+                key = ingredient_key(record)
+                if key is None:
+                    self.stats['rejected'] += 1
+                else:
+                    ingredients.append(key)
+        with transaction.atomic():
+            if tags:
+                self.create_tags(tags)
+            if ingredients:
+                self.stats['ingredients'] += self.create_ingredients(
+                    ingredients
+                )
+            if recipes:
+                self.create_recipes(recipes)
+
+    def create_tags(self, records):
+        tags = []
+        for record in records:
+            if not all(record.get(field) for field in TAG_FIELDS):
+                self.stats['rejected'] += 1
+            elif record['slug'] not in self.tag_ids:
+                tags.append(Tag(**{
+                    field: record[field] for field in TAG_FIELDS
+                }))
+        Tag.objects.bulk_create(tags, ignore_conflicts=True)
+        known = len(self.tag_ids)
+        self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        self.stats['tags'] += len(self.tag_ids) - known
+
+    def create_ingredients(self, keys, remember=False):
+        """Создает недостающие ингредиенты, возвращает число новых.
+
+        С remember запоминает id всех ключей для связей рецептов.
+        """
+        keys = set(keys) - self.ingredient_ids.keys()
+        if not keys:
+            return 0
+        missing = keys - self.find_ingredients(keys, remember)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in missing],
+            ignore_conflicts=True,
+        )
+        if remember and missing:
+            self.find_ingredients(missing, remember)
+        return len(missing)
+
+    def find_ingredients(self, keys, remember):
+        found = set()
+        for name, unit, pk in Ingredient.objects.filter(
+            name__in={name for name, _ in keys},
+        ).values_list('name', 'measurement_unit', 'id'):
+            if (name, unit) in keys:
+                found.add((name, unit))
+                if remember:
+                    self.ingredient_ids[name, unit] = pk
+        return found
+
+    def get_author_id(self, record):
+        author = record.get('author') or self.default_author
+        if isinstance(author, dict):
+            author = author.get('email') or author.get('username')
+        if not author:
+            return None
+        if author not in self.author_ids:
+            self.author_ids[author] = User.objects.filter(
+                Q(email=author) | Q(username=author)
+            ).values_list('id', flat=True).first()
+        return self.author_ids[author]
+
+    def parse_recipe(self, record):
+        """Рецепт и его ингредиенты или None для некорректной записи."""
+        name = str(record.get('name') or '').strip()
+        author_id = self.get_author_id(record)
+        if not name or len(name) > RECIPE_NAME_LENGTH or author_id is None:
+            return None
+        amounts = {}
+        try:
+            for item in record['ingredients']:
+                key = ingredient_key(item)
+                amount = int(item['amount'])
+                if key is None or amount < 1:
+                    return None
+                amounts[key] = amounts.get(key, 0) + amount
+            cooking_time = int(record['cooking_time'])
+            for validator in COOKING_TIME_VALIDATORS:
+                validator(cooking_time)
+        except (KeyError, TypeError, ValueError, ValidationError):
+            return None
+        if not amounts:
+            return None
+        recipe = Recipe(
+            author_id=author_id,
+            name=name,
+            text=record.get('text') or '',
+            cooking_time=cooking_time,
+            image=get_image_path(record),
+        )
+        slugs = {
+            tag['slug'] if isinstance(tag, dict) else tag
+            for tag in record.get('tags') or ()
+        }
+        return recipe, amounts, slugs
+
+    def create_recipes(self, records):
+        parsed = {}
+        for record in records:
+            result = self.parse_recipe(record)
+            if result is None:
+                self.stats['rejected'] += 1
+            elif result[0].name in parsed:
+                self.stats['skipped'] += 1
+            else:
+                parsed[result[0].name] = result
+        existing = set(Recipe.objects.filter(
+            name__in=parsed
+        ).values_list('name', flat=True))
+        self.stats['skipped'] += len(existing)
+        for name in existing:
+            del parsed[name]
+        if not parsed:
+            return
+        self.stats['ingredients'] += self.create_ingredients(
+            (key for _, amounts, _ in parsed.values() for key in amounts),
+            remember=True,
+        )
+        Recipe.objects.bulk_create(
+            [recipe for recipe, _, _ in parsed.values()],
+            ignore_conflicts=True,
+        )
+        # SQLite не возвращает id из bulk_create, читаем их по названиям.
+        created = dict(Recipe.objects.filter(
+            name__in=parsed
+        ).values_list('name', 'id'))
+        links = []
+        tags = []
+        for name, (recipe, amounts, slugs) in parsed.items():
+            links.extend(
+                RecipeIngredient(recipe_id=created[name],
+                                 ingredient_id=self.ingredient_ids[key],
+                                 amount=amount)
+                for key, amount in amounts.items()
+            )
+            tags.extend(
+                RecipeTag(recipe_id=created[name], tag_id=self.tag_ids[slug])
+                for slug in slugs if slug in self.tag_ids
+            )
+            self.changed_authors.add(recipe.author_id)
+        RecipeIngredient.objects.bulk_create(links, ignore_conflicts=True)
+        RecipeTag.objects.bulk_create(tags, ignore_conflicts=True)
+        self.recipe_ids.extend(created.values())
+        self.stats['recipes'] += len(created)
+
+    def finish(self):
+        """Обновляет то, что при bulk_create делают сигналы."""
+        if self.stats['tags']:
+            transaction.on_commit(lambda: bump_model_version(Tag))
+        if self.stats['ingredients']:
+            transaction.on_commit(lambda: bump_model_version(Ingredient))
+        if self.recipe_ids:
+            User.objects.filter(pk__in=self.changed_authors).update(
+                recipes_count=count_of(Recipe, 'author')
+            )
+            rebuild_follower_feeds(self.changed_authors)
+            get_recipe_search().index(self.recipe_ids)
+            invalidate_recipe_pages(lists=True)
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+
+from .membership import CART, FAVORITES, FOLLOWING, get_members
+
+
+def membership_state(request, recipes):
+    """Отметки пользователя, которые попадают в ответ по рецептам."""
+    if request.user.is_anonymous:
+        return ''
+    recipe_ids = {recipe.id for recipe in recipes}
+    author_ids = {recipe.author_id for recipe in recipes}
+    return ';'.join(
+        ','.join(map(str, sorted(get_members(request, relation) & ids)))
+        for relation, ids in ((FAVORITES, recipe_ids), (CART, recipe_ids),
+                              (FOLLOWING, author_ids))
+    )
+
+
+class RecipeValidators:
+    """ETag и Last-Modified для набора рецептов.
+
+    Считаются по id и наибольшему updated_at без сериализации.
+    """
+
+    def __init__(self, request, recipes, *extra):
+        self.request = request
+        last_modified = max(
+            (recipe.updated_at for recipe in recipes), default=None
+        )
+        self.last_modified = (
+            int(last_modified.timestamp()) if last_modified else None
+        )
+        state = '|'.join(map(str, (
+            request.user.id,
+            ','.join(str(recipe.id) for recipe in recipes),
+            last_modified.isoformat() if last_modified else '',
+            membership_state(request, recipes),
+            *extra,
+        )))
+        self.etag = quote_etag(hashlib.md5(state.encode()).hexdigest())
+
+    def not_modified(self):
+        return get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+
+    def apply(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import os
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from rest_framework import renderers
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingCartExporter(renderers.BaseRenderer, ABC):
+    """Выгружает список покупок построчно, не собирая файл в памяти.
+
+    Исключение составляет PdfExporter.
+
+    Экспортеры выступают рендерерами DRF, поэтому формат выбирается
+    стандартным параметром ?format= или заголовком Accept.
+    """
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Сюда попадают только ответы с ошибками, файл отдается потоком.
+        json_renderer = renderers.JSONRenderer()
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = json_renderer.media_type
+        return json_renderer.render(data)
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Части файла для StreamingHttpResponse."""
+
+
+class TextExporter(ShoppingCartExporter):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, ingredients):
+        for item in ingredients:
+            yield (f'{item["name"]} - {item["amount"]} '
+                   f'{item["measurement_unit"]} \n')
+
+
+class CsvExporter(ShoppingCartExporter):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единицы'))
+        for item in ingredients:
+            yield writer.writerow((
+                item['name'],
+                item['amount'],
+                item['measurement_unit'],
+            ))
+
+
+class JsonExporter(ShoppingCartExporter):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def stream(self, ingredients):
+        yield '['
+        separator = ''
+        for item in ingredients:
+            yield separator + json.dumps(item, ensure_ascii=False,
+                                         default=str)
+            separator = ','
+        yield ']'
+
+
+class PdfExporter(ShoppingCartExporter):
+    """PDF со списком покупок.
+
+    В отличие от остальных форматов отдается не построчно: Canvas из
+    reportlab держит все страницы в памяти до save(), и первый байт
+    уходит только после сборки всего документа. Память и задержка
+    растут с числом строк, то есть различных ингредиентов в списке.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    font_name = 'ShoppingCartFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def get_font(self):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        font_path = settings.SHOPPING_CART_PDF_FONT
+        if not font_path or not os.path.exists(font_path):
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def stream(self, ingredients):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
+        font = self.get_font()
+        width, height = A4
+        output = io.BytesIO()
+        page = canvas.Canvas(output, pagesize=A4)
+        page.setTitle('Список покупок')
+        page.setFont(font, self.font_size)
+        position = height - self.margin
+        for item in ingredients:
+            if position < self.margin:
+                page.showPage()
+                page.setFont(font, self.font_size)
+                position = height - self.margin
+            page.drawString(
+                self.margin, position,
+                f'{item["name"]} - {item["amount"]} '
+                f'{item["measurement_unit"]}'
+            )
+            position -= self.line_height
+        page.save()
+        document = output.getbuffer()
+        for start in range(0, len(document), FILE_CHUNK_SIZE):
+            yield bytes(document[start:start + FILE_CHUNK_SIZE])
+
+
+EXPORTERS = (TextExporter, CsvExporter, PdfExporter, JsonExporter)
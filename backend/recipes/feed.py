@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import FeedEntry, Recipe
+from users.models import Follow, User
+
+TRIM_BATCH_SIZE = 500
+
+
+def uses_stored_feed(following_count):
+    """Лента из FeedEntry для подписанных хотя бы на порог авторов."""
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    return bool(threshold) and following_count >= threshold
+
+
+def followed_recipes(user_id):
+    """Рецепты авторов из подписок, собираются при чтении."""
+    return Recipe.objects.filter(author_id__in=Follow.objects.filter(
+        user_id=user_id
+    ).values('author_id'))
+
+
+def stored_recipes(user_id):
+    return Recipe.objects.filter(id__in=FeedEntry.objects.filter(
+        user_id=user_id
+    ).values('recipe_id'))
+
+
+def get_feed(user):
+    if uses_stored_feed(user.following_count):
+        return stored_recipes(user.id)
+    return followed_recipes(user.id)
+
+
+def trim_feeds(user_ids):
+    """Оставляет в лентах только FEED_SIZE последних рецептов."""
+    oldest_kept = FeedEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-recipe_id').values('recipe_id')[
+        settings.FEED_SIZE - 1:settings.FEED_SIZE
+    ]
+    for start in range(0, len(user_ids), TRIM_BATCH_SIZE):
+        FeedEntry.objects.filter(
+            user_id__in=user_ids[start:start + TRIM_BATCH_SIZE],
+            recipe_id__lt=Subquery(oldest_kept),
+        ).delete()
+
+
+def fan_out(recipe_id, author_id):
+    """Добавляет новый рецепт в сохраненные ленты подписчиков."""
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    if not threshold:
+        return
+    user_ids = list(Follow.objects.filter(
+        author_id=author_id, user__following_count__gte=threshold
+    ).values_list('user_id', flat=True))
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id in user_ids],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    trim_feeds(user_ids)
+
+
+def rebuild_feed(user_id):
+    """Заполняет сохраненную ленту заново или удаляет ненужную."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    following_count = User.objects.filter(pk=user_id).values_list(
+        'following_count', flat=True
+    ).first()
+    if following_count is None or not uses_stored_feed(following_count):
+        return
+    recipe_ids = followed_recipes(user_id).order_by('-id').values_list(
+        'id', flat=True
+    )[:settings.FEED_SIZE]
+    FeedEntry.objects.bulk_create(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id)
+        for recipe_id in recipe_ids
+    )
+
+
+def rebuild_follower_feeds(author_ids):
+    """Перестраивает сохраненные ленты подписчиков авторов.
+
+    Нужна после bulk_create рецептов: сигнал с fan_out не вызывается.
+    """
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    if not threshold:
+        return
+    user_ids = Follow.objects.filter(
+        author_id__in=author_ids, user__following_count__gte=threshold
+    ).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        rebuild_feed(user_id)
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from .images import get_image_urls
+
+
+class RecipeImageField(serializers.Field):
+    """Ссылки на уменьшенные копии фото рецепта.
+
+    Пока копии не готовы, отдается ссылка на оригинал.
+    """
+
+    def __init__(self, rendition=None, **kwargs):
+        self.rendition = rendition
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        urls = get_image_urls(recipe, self.context.get('request'))
+        if urls is None or self.rendition is None:
+            return urls
+        return urls[self.rendition]
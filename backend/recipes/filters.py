@@ -1,33 +1,58 @@
 import django_filters as filters
+from django.db import connection
+from django_filters.widgets import BooleanWidget, QueryArrayWidget
+from rest_framework.exceptions import ValidationError
 
+from users.paginator import CustomPageNumberPaginator
+
+from .autocomplete import (get_autocomplete_limit, ingredient_index,
+                           order_by_ids, rank_by_prefix)
 from .models import Ingredient, Recipe
+from .search import get_recipe_search
+from .tags import filter_by_tags
 
 
 class IngredientsFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains',
-    )
+    name = filters.CharFilter(method='get_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_name(self, queryset, name, item_value):
+        limit = get_autocomplete_limit(self.data.get('limit'))
+        if connection.vendor == 'postgresql':
+            return rank_by_prefix(queryset, item_value)[:limit]
+        return order_by_ids(
+            queryset, ingredient_index.search(item_value, limit)
+        )
+
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
-        lookup_expr="iexact",
+    tags = filters.Filter(
+        method='get_tags',
+        widget=QueryArrayWidget,
         label='Tags',
     )
+    all_tags = filters.BooleanFilter(
+        method='get_all_tags',
+        widget=BooleanWidget,
+        label='Match all tags',
+    )
     is_favorited = filters.BooleanFilter(
         method='get_favorite',
+        widget=BooleanWidget,
         label='Favorited',
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_shopping',
+        widget=BooleanWidget,
         label='Is in shopping list',
     )
+    search = filters.CharFilter(
+        method='get_search',
+        label='Search',
+    )
 
     class Meta:
         model = Recipe
@@ -38,13 +63,28 @@ class RecipeFilter(filters.FilterSet):
             'is_in_shopping_cart',
         )
 
+    def get_tags(self, queryset, name, item_value):
+        return filter_by_tags(queryset, item_value,
+                              self.form.cleaned_data.get('all_tags'))
+
+    def get_all_tags(self, queryset, name, item_value):
+        return queryset
+
     def get_favorite(self, queryset, name, item_value):
         if self.request.user.is_authenticated and item_value:
-            queryset = queryset.filter(in_favorite__user__user=self.request.user)
+            queryset = queryset.favorited_by(self.request.user)
         return queryset
 
     def get_shopping(self, queryset, name, item_value):
         if self.request.user.is_authenticated and item_value:
-            queryset = queryset.filter(shopping_cart__user=self.request.user)
+            queryset = queryset.in_cart_of(self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, item_value):
+        # Курсор сортирует по id и потерял бы сортировку по релевантности.
+        cursor = CustomPageNumberPaginator.cursor_query_param
+        if cursor in self.request.query_params:
+            raise ValidationError(
+                {cursor: 'Курсор нельзя сочетать с поиском, используйте page'}
+            )
+        return get_recipe_search().search(queryset, item_value)
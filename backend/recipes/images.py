@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RENDITION_FORMAT = 'webp'
+RENDITION_QUALITY = 80
+
+
+def rendition_name(image_hash, rendition):
+    return (f'recipes/renditions/{image_hash[:2]}/{image_hash}/'
+            f'{rendition}.{RENDITION_FORMAT}')
+
+
+def renditions_exist(image_hash):
+    return all(
+        default_storage.exists(rendition_name(image_hash, rendition))
+        for rendition in RENDITIONS
+    )
+
+
+def store_original(image):
+    """Сохраняет оригинал под именем из хеша содержимого.
+
+    Одинаковые файлы хранятся один раз.
+    """
+    hasher = hashlib.sha256()
+    for chunk in image.chunks():
+        hasher.update(chunk)
+    image_hash = hasher.hexdigest()
+    extension = os.path.splitext(image.name)[1].lower()
+    name = f'recipes/{image_hash}{extension}'
+    if not default_storage.exists(name):
+        image.seek(0)
+        name = default_storage.save(name, image)
+    return name, image_hash
+
+
+def build_renditions(image_name, image_hash):
+    from .models import Recipe
+
+    try:
+        with default_storage.open(image_name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            for rendition, size in RENDITIONS.items():
+                name = rendition_name(image_hash, rendition)
+                if default_storage.exists(name):
+                    continue
+                resized = image.copy()
+                resized.thumbnail(size, Image.LANCZOS)
+                output = BytesIO()
+                resized.save(output, RENDITION_FORMAT,
+                             quality=RENDITION_QUALITY)
+                default_storage.save(name, ContentFile(output.getvalue()))
+    except (OSError, ValueError):
+        logger.exception('Не удалось обработать изображение %s', image_name)
+        return
+    Recipe.objects.filter(image_hash=image_hash).touch(
+        image_renditions_ready=True
+    )
+
+
+class ImmediateBackend:
+    def submit(self, func, *args):
+        func(*args)
+
+
+class ThreadPoolBackend:
+    def __init__(self, workers=None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+
+    def run(self, func, *args):
+        try:
+            func(*args)
+        finally:
+            connections.close_all()
+
+    def submit(self, func, *args):
+        return self.executor.submit(self.run, func, *args)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.IMAGE_PIPELINE_BACKEND)()
+
+
+def schedule_renditions(image_name, image_hash):
+    transaction.on_commit(
+        lambda: get_backend().submit(build_renditions, image_name, image_hash)
+    )
+
+
+def get_image_urls(recipe, request=None):
+    if not recipe.image:
+        return None
+    if recipe.image_renditions_ready:
+        urls = {
+            rendition: default_storage.url(
+                rendition_name(recipe.image_hash, rendition)
+            )
+            for rendition in RENDITIONS
+        }
+    else:
+        urls = dict.fromkeys(RENDITIONS, recipe.image.url)
+    if request is not None:
+        urls = {
+            rendition: request.build_absolute_uri(url)
+            for rendition, url in urls.items()
+        }
+    return urls
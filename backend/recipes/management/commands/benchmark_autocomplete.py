@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from recipes.benchmarks import format_result, measure
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку поиска ингредиентов по префиксам названий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix-length', type=int, default=2)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        length = options['prefix_length']
+        prefixes = sorted({
+            name[:length] for name in
+            Ingredient.objects.values_list('name', flat=True)
+            if len(name) >= length
+        })
+        if not prefixes:
+            self.stderr.write('Таблица ингредиентов пуста')
+            return
+        client = Client()
+        result = measure(
+            lambda number: client.get('/api/ingredients/', {
+                'name': prefixes[number % len(prefixes)],
+                'limit': options['limit'],
+            }),
+            options['repeat'] * len(prefixes),
+        )
+        self.stdout.write(format_result('ingredients-list', result))
@@ -0,0 +1,116 @@
+from base64 import b64encode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.benchmarks import format_result, measure
+from recipes.feed import fan_out, rebuild_feed
+from recipes.models import FeedEntry, Recipe
+from users.counters import count_of
+from users.models import Follow, User
+
+# Глубина страницы с курсором в рецептах от начала ленты.
+DEEP_OFFSET = 300
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту рецептов, собираемую при чтении, с хранимой '
+            'лентой при разном числе подписок: p50/p95/p99 в миллисекундах '
+            'и число SQL-запросов. Данные готовит generate_benchmark_data, '
+            'подписки создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', type=int, nargs='+',
+                            default=[10, 50, 200],
+                            help='Число подписок пользователя')
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        authors = list(User.objects.filter(
+            recipes_count__gt=0
+        ).order_by('id').values_list('id', flat=True))
+        if len(authors) < 2:
+            raise CommandError('Сначала выполните generate_benchmark_data')
+        results = {}
+        with transaction.atomic():
+            self.user = User.objects.create(
+                username='feed-benchmark',
+                email='feed-benchmark@example.com',
+            )
+            token = Token.objects.create(user=self.user)
+            self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            for follows in options['follows']:
+                self.follow(authors[:follows])
+                results.update(self.measure_reads(
+                    f'follows={min(follows, len(authors))}',
+                    options['requests'],
+                ))
+            results.update(self.measure_fan_out(authors[0],
+                                                options['requests']))
+            transaction.set_rollback(True)
+        for name, result in results.items():
+            self.stdout.write(format_result(name, result))
+
+    def follow(self, author_ids):
+        Follow.objects.filter(user=self.user).delete()
+        Follow.objects.bulk_create(
+            Follow(user=self.user, author_id=author_id)
+            for author_id in author_ids
+        )
+        User.objects.filter(pk=self.user.pk).update(
+            following_count=count_of(Follow, 'user')
+        )
+
+    def get(self, params):
+        response = self.client.get('/api/recipes/feed/', params)
+        if response.status_code != 200:
+            raise CommandError(f'Лента: ответ {response.status_code}')
+        return response
+
+    def measure_reads(self, label, requests):
+        position = Recipe.objects.filter(
+            author__following__user=self.user
+        ).order_by('-id').values_list('id', flat=True)[DEEP_OFFSET:].first()
+        results = {}
+        for mode, threshold in (('read', 0), ('write', 1)):
+            with override_settings(FEED_FANOUT_THRESHOLD=threshold):
+                rebuild_feed(self.user.pk)
+                results[f'feed {mode} {label}'] = measure(
+                    lambda number: self.get({}), requests
+                )
+                if position is not None:
+                    # Курсор пагинатора: id, после которого идет страница.
+                    params = {'cursor': b64encode(
+                        str(position).encode('ascii')
+                    ).decode('ascii')}
+                    results[f'feed {mode} {label} deep'] = measure(
+                        lambda number: self.get(params), requests
+                    )
+        return results
+
+    def measure_fan_out(self, author_id, requests):
+        """Цена записи: новый рецепт автора, на которого подписаны все."""
+        user_ids = list(User.objects.exclude(
+            pk=author_id
+        ).values_list('id', flat=True))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        User.objects.filter(pk__in=user_ids).update(
+            following_count=count_of(Follow, 'user')
+        )
+        recipe_ids = list(Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        )[:requests])
+        with override_settings(FEED_FANOUT_THRESHOLD=1):
+            result = measure(
+                lambda number: fan_out(recipe_ids[number % len(recipe_ids)],
+                                       author_id),
+                requests,
+            )
+        FeedEntry.objects.all().delete()
+        return {f'fan_out followers={len(user_ids)}': result}
@@ -0,0 +1,44 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from recipes.benchmarks import WORDS, format_result, measure
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку поиска рецептов. С --generate сначала '
+            'создает синтетические рецепты командой '
+            'generate_benchmark_data, запускать на тестовой базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generate', type=int, default=0)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['generate']:
+            call_command(
+                'generate_benchmark_data', users=1,
+                recipes=options['generate'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                favorites=0, cart=0, follows=0, seed=options['seed'],
+                stdout=StringIO(),
+            )
+        if not Recipe.objects.exists():
+            raise CommandError('Нет рецептов, используйте --generate')
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        terms = [name.split()[0] for name in names] + list(WORDS)
+        client = Client()
+        result = measure(
+            lambda number: client.get('/api/recipes/',
+                                      {'search': rng.choice(terms)}),
+            options['queries'],
+        )
+        self.stdout.write(f'Рецептов: {Recipe.objects.count()}')
+        self.stdout.write(format_result('recipes-list search', result))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import EXPORT_BATCH_SIZE, export_catalog
+
+
+class Command(BaseCommand):
+    help = ('Выгружает теги, ингредиенты и рецепты в NDJSON потоком. '
+            'Файл загружается обратно командой import_catalog.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл, по умолчанию stdout')
+        parser.add_argument('--batch-size', type=int,
+                            default=EXPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file = (open(output, 'w', encoding='utf-8') if output
+                else sys.stdout)
+        lines = 0
+        try:
+            for line in export_catalog(options['batch_size']):
+                file.write(line)
+                lines += 1
+        finally:
+            if output:
+                file.close()
+        if output:
+            self.stdout.write(f'Записано строк: {lines} в {output}')
@@ -0,0 +1,153 @@
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.benchmarks import WORDS
+from recipes.cart import bump_cart_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingList, Tag)
+from recipes.page_cache import invalidate_recipe_pages
+from recipes.reference_cache import bump_model_version
+from recipes.search import get_recipe_search
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark-password'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F5C542', 'dessert'),
+    ('Выпечка', '#B5651D', 'baking'),
+    ('Постное', '#2D9CDB', 'lenten'),
+)
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def create_in_batches(model, objects):
+    objects = list(objects)
+    for start in range(0, len(objects), BATCH_SIZE):
+        with transaction.atomic():
+            model.objects.bulk_create(objects[start:start + BATCH_SIZE],
+                                      ignore_conflicts=True)
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетических пользователей, рецепты, избранное, '
+            'списки покупок и подписки для замеров. Ингредиенты берутся '
+            'из fixtures/ingredients.json. Запускать на тестовой базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if not Ingredient.objects.exists():
+            call_command('loaddata',
+                         settings.BASE_DIR / 'fixtures' / 'ingredients.json',
+                         verbosity=0)
+        tag_ids = [
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )[0].id
+            for name, color, slug in TAGS
+        ]
+        user_ids = self.create_users(options['users'])
+        self.stdout.write(f'Пользователей: {len(user_ids)}')
+        recipe_ids = self.create_recipes(
+            rng, user_ids, tag_ids, options['recipes'],
+            options['ingredients_per_recipe'],
+        )
+        self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+        all_recipes = list(Recipe.objects.values_list('id', flat=True))
+        all_users = list(User.objects.values_list('id', flat=True))
+        changed_recipes = set(recipe_ids)
+        for model, field, targets, count in (
+            (Favorite, 'recipe_id', all_recipes, options['favorites']),
+            (ShoppingList, 'recipe_id', all_recipes, options['cart']),
+            (Follow, 'author_id', all_users, options['follows']),
+        ):
+            objects = [
+                model(user_id=user_id, **{field: target})
+                for user_id in user_ids
+                for target in rng.sample(targets, min(count, len(targets)))
+                if not (model is Follow and target == user_id)
+            ]
+            if model is not Follow:
+                changed_recipes.update(obj.recipe_id for obj in objects)
+            create_in_batches(model, objects)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'{model.objects.count()}'
+            )
+        # bulk_create не вызывает сигналы: счетчики, ленты и поисковый
+        # индекс пересчитываем целиком, а в общем кеше сбрасываем только версии
+        # затронутых данных.
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        get_recipe_search().index()
+        bump_model_version(Tag)
+        bump_model_version(Ingredient)
+        invalidate_recipe_pages(changed_recipes, lists=True)
+        bump_cart_version(*user_ids)
+
+    def create_users(self, count):
+        start = last_id(User)
+        password = make_password(PASSWORD)
+        create_in_batches(User, (
+            User(
+                username=f'bench{start + number}',
+                email=f'bench{start + number}@example.com',
+                first_name='Benchmark',
+                last_name=f'User {start + number}',
+                password=password,
+            )
+            for number in range(1, count + 1)
+        ))
+        return list(User.objects.filter(id__gt=start).values_list(
+            'id', flat=True
+        ))
+
+    def create_recipes(self, rng, user_ids, tag_ids, count, per_recipe):
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        start = last_id(Recipe)
+        create_in_batches(Recipe, (
+            Recipe(
+                author_id=rng.choice(user_ids),
+                name=(f'{rng.choice(WORDS).capitalize()} '
+                      f'{rng.choice(ingredients)[1]} {start + number}'),
+                text=' '.join(rng.choices(WORDS, k=30)),
+                image='recipes/benchmark.png',
+                cooking_time=rng.randint(5, 120),
+            )
+            for number in range(1, count + 1)
+        ))
+        recipe_ids = list(Recipe.objects.filter(id__gt=start).values_list(
+            'id', flat=True
+        ))
+        create_in_batches(RecipeIngredient, (
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=pk,
+                             amount=rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for pk, _ in rng.sample(ingredients, per_recipe)
+        ))
+        create_in_batches(RecipeTag, (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+        ))
+        return recipe_ids
@@ -0,0 +1,67 @@
+import csv
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.catalog import FORMATS, READERS, CatalogImporter, guess_format
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты и рецепты из JSON, NDJSON или CSV '
+            'пакетами. Записи читаются потоком, существующие ингредиенты '
+            '(название и единица измерения) и рецепты (название) '
+            'пропускаются, поэтому загрузку можно повторять.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--author',
+                            help='email или username автора рецептов, '
+                                 'у которых автор не указан')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        importer = CatalogImporter(default_author=options['author'])
+        started = time.monotonic()
+        file = (sys.stdin if path == '-'
+                else open(path, encoding='utf-8', newline=''))
+        try:
+            records = READERS[file_format](file)
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                importer.add_batch(batch)
+                self.report(importer.stats, started)
+        except (ValueError, csv.Error) as error:
+            raise CommandError(
+                f'Ошибка чтения, обработано записей '
+                f'{importer.stats["read"]}: {error}'
+            )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            # Уже загруженные пакеты остаются, даже если файл поврежден.
+            with transaction.atomic():
+                importer.finish()
+        self.report(importer.stats, started, final=True)
+
+    def report(self, stats, started, final=False):
+        elapsed = time.monotonic() - started
+        rate = stats['read'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{"Готово" if final else "Прочитано"}: '
+            f'{stats["read"]} записей за {elapsed:.1f} с '
+            f'({rate:.0f} в секунду), новых тегов {stats["tags"]}, '
+            f'ингредиентов {stats["ingredients"]}, '
+            f'рецептов {stats["recipes"]}, '
+            f'пропущено {stats["skipped"]}, отклонено {stats["rejected"]}'
+        )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feed
+from recipes.models import FeedEntry
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает хранимые ленты рецептов. Нужна после изменения '
+            'FEED_FANOUT_THRESHOLD или FEED_SIZE.')
+
+    def handle(self, *args, **options):
+        threshold = settings.FEED_FANOUT_THRESHOLD
+        stale = FeedEntry.objects.all()
+        if threshold:
+            stale = stale.exclude(user__following_count__gte=threshold)
+        deleted, _ = stale.delete()
+        rebuilt = 0
+        if threshold:
+            user_ids = User.objects.filter(
+                following_count__gte=threshold
+            ).values_list('id', flat=True)
+            for user_id in user_ids.iterator():
+                with transaction.atomic():
+                    rebuild_feed(user_id)
+                rebuilt += 1
+        self.stdout.write(
+            f'Перестроено лент: {rebuilt}, удалено записей: {deleted}'
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import get_recipe_search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс рецептов'
+
+    def handle(self, *args, **options):
+        get_recipe_search().index()
+        self.stdout.write('Индекс рецептов перестроен')
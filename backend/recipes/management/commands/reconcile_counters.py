@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.counters import reconcile_counters
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики рецептов и авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = reconcile_counters(Recipe.objects.all(), {
+            'favorites_count': (Favorite, 'recipe'),
+            'in_carts_count': (ShoppingList, 'recipe'),
+        }, batch_size)
+        users = reconcile_counters(User.objects.all(), {
+            'recipes_count': (Recipe, 'author'),
+            'followers_count': (Follow, 'author'),
+            'following_count': (Follow, 'user'),
+        }, batch_size)
+        self.stdout.write(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}'
+        )
@@ -0,0 +1,177 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.benchmarks import compare, format_result, measure
+from recipes.cart import aggregate_cart
+from recipes.models import (Ingredient, Recipe, Tag,
+                            prefetch_recipe_relations)
+from recipes.serializers import ShowRecipeFullSerializer
+from users.models import User
+from users.serializers import ShowFollowSerializer
+
+PAGE_SIZE = settings.REST_FRAMEWORK['PAGE_SIZE']
+PAGES = 5
+# Результаты на данных generate_benchmark_data с параметрами по умолчанию.
+# По умолчанию с ними сравнивается только число запросов.
+BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет сериализаторы, сборку списка покупок и основные '
+            'эндпоинты API: p50/p95/p99 в миллисекундах и число '
+            'SQL-запросов. Данные готовит generate_benchmark_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50,
+                            help='Повторов каждого микробенчмарка')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов к каждому эндпоинту')
+        parser.add_argument('--only', choices=('micro', 'load'))
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--baseline', default=str(BASELINE),
+                            help='Сравнить с сохраненными результатами, '
+                                 'пустая строка отключает сравнение')
+        parser.add_argument('--tolerance', type=float,
+                            help='Допустимый рост p95, доля. Без него '
+                                 'регрессией считается только рост числа '
+                                 'запросов: время зависит от машины')
+
+    def handle(self, *args, **options):
+        self.user = User.objects.annotate(
+            follows=Count('follower', distinct=True),
+            cart=Count('shopping_list', distinct=True),
+        ).filter(follows__gt=0, cart__gt=0).order_by('id').first()
+        if self.user is None:
+            raise CommandError('Сначала выполните generate_benchmark_data')
+        results = {}
+        if options['only'] != 'load':
+            results.update(self.micro_benchmarks(options['runs']))
+        if options['only'] != 'micro':
+            results.update(self.load_benchmarks(options['requests']))
+        for name, result in results.items():
+            self.stdout.write(format_result(name, result))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'database': connection.vendor,
+                    'recipes': Recipe.objects.count(),
+                    'users': User.objects.count(),
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+            lines, regressions = compare(results, baseline,
+                                         options['tolerance'])
+            self.stdout.write('\n'.join(lines))
+            if regressions:
+                raise CommandError('Регрессия: ' + ', '.join(regressions))
+
+    def get(self, client, path, params=None):
+        response = client.get(path, params)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: ответ {response.status_code}')
+        return response
+
+    def make_request(self):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.user
+        return request
+
+    def micro_benchmarks(self, runs):
+        recipes = list(Recipe.objects.order_by('-id')[:PAGE_SIZE])
+        prefetch_recipe_relations(recipes)
+        authors = list(User.objects.filter(
+            following__user=self.user
+        ).order_by('username')[:PAGE_SIZE])
+        latest = Recipe.objects.latest_for_authors(
+            [author.id for author in authors], 3
+        ).order_by('-id')
+        prefetch_related_objects(authors, Prefetch(
+            'recipes', queryset=latest, to_attr='latest_recipes'
+        ))
+
+        def serialize(serializer, objects):
+            return lambda number: serializer(
+                objects, many=True, context={'request': self.make_request()}
+            ).data
+
+        return {
+            'serializer.ShowRecipeFullSerializer': measure(
+                serialize(ShowRecipeFullSerializer, recipes), runs
+            ),
+            'serializer.ShowFollowSerializer': measure(
+                serialize(ShowFollowSerializer, authors), runs
+            ),
+            'cart.aggregate': measure(
+                lambda number: list(aggregate_cart(self.user.id)), runs
+            ),
+        }
+
+    def load_benchmarks(self, requests):
+        token, _ = Token.objects.get_or_create(user=self.user)
+        anonymous = Client()
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        recipe_ids = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)[:50]
+        )
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        prefixes = sorted({
+            name[:2] for name in
+            Ingredient.objects.values_list('name', flat=True)[:500]
+        })
+        if not recipe_ids or not tags or not prefixes:
+            raise CommandError('Сначала выполните generate_benchmark_data')
+
+        def recipe(number):
+            return f'/api/recipes/{recipe_ids[number % len(recipe_ids)]}/'
+
+        def page(number):
+            return {'page': number % PAGES + 1}
+
+        endpoints = {
+            'anonymous recipes-list': lambda number: self.get(
+                anonymous, '/api/recipes/', page(number)
+            ),
+            'anonymous recipes-detail': lambda number: self.get(
+                anonymous, recipe(number)
+            ),
+            'recipes-list': lambda number: self.get(
+                client, '/api/recipes/', page(number)
+            ),
+            'recipes-list tags': lambda number: self.get(
+                client, '/api/recipes/', {'tags': tags[number % len(tags)]}
+            ),
+            'recipes-list is_favorited': lambda number: self.get(
+                client, '/api/recipes/', {'is_favorited': 1}
+            ),
+            'recipes-detail': lambda number: self.get(
+                client, recipe(number)
+            ),
+            'subscription': lambda number: self.get(
+                client, '/api/users/subscriptions/', {'recipes_limit': 3}
+            ),
+            'recipes-feed': lambda number: self.get(
+                client, '/api/recipes/feed/'
+            ),
+            'recipes-download-shopping-cart': lambda number: self.get(
+                client, '/api/recipes/download_shopping_cart/'
+            ),
+            'ingredients-list': lambda number: self.get(
+                client, '/api/ingredients/',
+                {'name': prefixes[number % len(prefixes)]},
+            ),
+            'tags-list': lambda number: self.get(client, '/api/tags/'),
+        }
+        return {
+            name: measure(request, requests)
+            for name, request in endpoints.items()
+        }
@@ -0,0 +1,245 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Favorite, ShoppingList
+from .versions import get_version, incr_version
+from users.models import Follow
+
+FAVORITES = 'favorites'
+CART = 'cart'
+FOLLOWING = 'following'
+
+RELATIONS = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    CART: (ShoppingList, 'recipe_id'),
+    FOLLOWING: (Follow, 'author_id'),
+}
+
+MEMBERSHIP_KEY = 'membership:{relation}:{user_id}'
+
+
+def load_members(relation, user_id):
+    model, field = RELATIONS[relation]
+    return set(model.objects.filter(user_id=user_id).values_list(
+        field, flat=True
+    ))
+
+
+class LocalMembershipBackend:
+    """Множества в памяти процесса с вытеснением давно не читавшихся.
+
+    Версия множества хранится в общем кеше: другой процесс, изменивший
+    связи, меняет версию, и здесь множество загружается заново.
+    """
+
+    def __init__(self, max_users=10000):
+        self.max_users = max_users
+        self.sets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, relation, user_id):
+        key = MEMBERSHIP_KEY.format(relation=relation, user_id=user_id)
+        version = get_version(key)
+        with self.lock:
+            entry = self.sets.get(key)
+            if entry is not None and entry[0] == version:
+                self.sets.move_to_end(key)
+                return set(entry[1])
+        members = load_members(relation, user_id)
+        self.store(key, version, members)
+        return set(members)
+
+    def store(self, key, version, members):
+        with self.lock:
+            self.sets[key] = (version, members)
+            self.sets.move_to_end(key)
+            while len(self.sets) > self.max_users:
+                self.sets.popitem(last=False)
+
+    def update(self, relation, user_id, added=(), removed=()):
+        key = MEMBERSHIP_KEY.format(relation=relation, user_id=user_id)
+        version = incr_version(key)
+        with self.lock:
+            entry = self.sets.pop(key, None)
+        # Множество, загруженное до чужого изменения, не дополняется:
+        # оно будет прочитано заново при следующем обращении.
+        if entry is not None and entry[0] == version - 1:
+            members = (entry[1] | set(added)) - set(removed)
+            self.store(key, version, members)
+
+
+class LocalWatchError(Exception):
+    pass
+
+
+class LocalRedis:
+    """Заменитель клиента Redis с нужным подмножеством команд."""
+    WatchError = LocalWatchError
+
+    def __init__(self):
+        self.data = {}
+        # Число изменений ключа, по нему pipeline проверяет WATCH.
+        self.revisions = {}
+        self.lock = threading.RLock()
+
+    def touch(self, key):
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+
+    def smembers(self, key):
+        with self.lock:
+            return {str(member).encode() for member in self.data.get(key, ())}
+
+    def sadd(self, key, *members):
+        with self.lock:
+            self.data.setdefault(key, set()).update(members)
+            self.touch(key)
+
+    def incr(self, key):
+        with self.lock:
+            self.data[key] = self.data.get(key, 0) + 1
+            self.touch(key)
+            return self.data[key]
+
+    def delete(self, key):
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self.touch(key)
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Транзакция LocalRedis по образцу pipeline из redis-py.
+
+    После watch() команды выполняются сразу, после multi() или без
+    watch() копятся до execute().
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.watched = {}
+        self.immediate = False
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.watched = {}
+        self.commands = []
+
+    def watch(self, *keys):
+        self.immediate = True
+        self.watched = {key: self.client.revisions.get(key, 0)
+                        for key in keys}
+
+    def multi(self):
+        self.immediate = False
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.immediate:
+            return command
+        return lambda *args: self.commands.append((command, args))
+
+    def execute(self):
+        with self.client.lock:
+            for key, revision in self.watched.items():
+                if self.client.revisions.get(key, 0) != revision:
+                    raise LocalWatchError(key)
+            return [command(*args) for command, args in self.commands]
+
+
+class RedisMembershipBackend:
+    """Множества в Redis, общие для всех процессов.
+
+    Пустое множество Redis удаляет, поэтому в каждом лежит метка 0.
+    update() не дополняет множество, а удаляет его и увеличивает счетчик
+    изменений. get() следит за счетчиком через WATCH и не сохраняет
+    множество, загруженное из базы во время чужого изменения.
+    Без MEMBERSHIP_REDIS_URL используется LocalRedis.
+    """
+    timeout = 24 * 60 * 60
+    marker = 0
+
+    def __init__(self, client=None):
+        self.client = client or self.get_client()
+        self.watch_error = (getattr(self.client, 'WatchError', None)
+                            or import_string('redis.WatchError'))
+
+    def get_client(self):
+        if not settings.MEMBERSHIP_REDIS_URL:
+            return LocalRedis()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для MEMBERSHIP_REDIS_URL нужен пакет redis'
+            )
+        return redis.Redis.from_url(settings.MEMBERSHIP_REDIS_URL)
+
+    def get(self, relation, user_id):
+        key = MEMBERSHIP_KEY.format(relation=relation, user_id=user_id)
+        with self.client.pipeline() as pipe:
+            pipe.watch(key + ':changes')
+            members = {int(member) for member in pipe.smembers(key)}
+            if self.marker in members:
+                return members - {self.marker}
+            members = load_members(relation, user_id)
+            pipe.multi()
+            pipe.sadd(key, self.marker, *members)
+            pipe.expire(key, self.timeout)
+            try:
+                pipe.execute()
+            except self.watch_error:
+                pass
+        return members
+
+    def update(self, relation, user_id, added=(), removed=()):
+        key = MEMBERSHIP_KEY.format(relation=relation, user_id=user_id)
+        with self.client.pipeline() as pipe:
+            pipe.incr(key + ':changes')
+            pipe.expire(key + ':changes', self.timeout)
+            pipe.delete(key)
+            pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.MEMBERSHIP_BACKEND)()
+
+
+def get_members(request, relation):
+    """Множество id, связанных с пользователем запроса.
+
+    Загружается один раз за запрос.
+    """
+    if not request or request.user.is_anonymous:
+        return set()
+    if not hasattr(request, 'memberships'):
+        request.memberships = {}
+    if relation not in request.memberships:
+        request.memberships[relation] = get_backend().get(
+            relation, request.user.id
+        )
+    return request.memberships[relation]
+
+
+def is_member(request, relation, member_id):
+    return member_id in get_members(request, relation)
+
+
+def update_members(relation, user_id, added=(), removed=()):
+    transaction.on_commit(lambda: get_backend().update(
+        relation, user_id, added, removed
+    ))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.5 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Хеш фото рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Уменьшенные копии фото готовы'),
+        ),
+    ]
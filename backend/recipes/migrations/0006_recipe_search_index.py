@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import migrations
+
+INGREDIENT_NAMES_SQL = (
+    'SELECT {aggregate} FROM recipes_recipeingredient ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id'
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe r SET search_vector = '
+            "setweight(to_tsvector(%s, r.name), 'A') || "
+            "setweight(to_tsvector(%s, COALESCE(("
+            + INGREDIENT_NAMES_SQL.format(
+                aggregate="string_agg(i.name, ' ')"
+            )
+            + "), '')), 'B') || "
+            "setweight(to_tsvector(%s, r.text), 'C')",
+            [settings.SEARCH_CONFIG] * 3
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            "name, text, ingredients, tokenize='unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts '
+            '(rowid, name, text, ingredients) '
+            'SELECT r.id, r.name, r.text, COALESCE(('
+            + INGREDIENT_NAMES_SQL.format(
+                aggregate="group_concat(i.name, ' ')"
+            )
+            + "), '') FROM recipes_recipe r"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-id', 'recipe'], name='favorite_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', '-id', 'recipe'], name='shopping_user_recent_idx'),
+        ),
+    ]
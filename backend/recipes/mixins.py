@@ -1,6 +1,36 @@
 from rest_framework import mixins, viewsets
 
+from .reference_cache import get_model_version, reference_cache
+
 
 class RetriveAndListViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
                             viewsets.GenericViewSet):
     pass
+
+
+class CachedRetriveAndListViewSet(RetriveAndListViewSet):
+    """Отдает справочники из кеша процесса с поддержкой ETag и 304."""
+
+    def is_cacheable(self, request):
+        return (request.accepted_renderer.format == 'json'
+                and not request.query_params)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return view(request, *args, **kwargs)
+        version = get_model_version(self.queryset.model)
+        key = request.path
+        entry = reference_cache.get(key, version)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = reference_cache.set(key, version, response.data)
+        return entry.response(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve,
+                                    *args, **kwargs)
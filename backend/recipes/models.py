@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import (F, Prefetch, UniqueConstraint, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
+from .page_cache import invalidate_recipe_pages
 
 User = get_user_model()
 
@@ -19,6 +24,9 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ('name',)
+        constraints = [UniqueConstraint(
+            fields=['name', 'measurement_unit'], name='unique_ingredient'
+        )]
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
 
@@ -52,6 +60,45 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def touch(self, lists=False, **fields):
+        """Отмечает рецепты измененными и сбрасывает их готовые ответы.
+
+        lists сбрасывает и списки: нужно, когда меняется состав выборок.
+        """
+        invalidate_recipe_pages(self.values_list('pk', flat=True), lists)
+        return self.update(updated_at=timezone.now(), **fields)
+
+    def favorited_by(self, user):
+        return self.filter(id__in=Favorite.objects.filter(
+            user=user
+        ).order_by().values('recipe_id'))
+
+    def in_cart_of(self, user):
+        return self.filter(id__in=ShoppingList.objects.filter(
+            user=user
+        ).order_by().values('recipe_id'))
+
+    def latest_for_authors(self, author_ids, limit):
+        if not author_ids:
+            return self.none()
+        ranked = Recipe.objects.filter(
+            author_id__in=author_ids
+        ).order_by().annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc(),
+            )
+        ).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.row_number <= %s',
+            (*params, limit),
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -68,6 +115,18 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Фото рецепта'
     )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Хеш фото рецепта'
+    )
+    image_renditions_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Уменьшенные копии фото готовы'
+    )
     text = models.TextField(
 
         verbose_name='Описание рецепта'
@@ -90,6 +149,23 @@ class Recipe(models.Model):
         ],
         verbose_name='Время приготовления в минутах',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
@@ -126,6 +202,18 @@ class RecipeIngredient(models.Model):
         return 'Ингридиент в рецепте'
 
 
+def prefetch_recipe_relations(recipes):
+    prefetch_related_objects(
+        recipes,
+        'tags',
+        'author',
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
 class RecipeTag(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -167,6 +255,10 @@ class Favorite(models.Model):
             fields=['user', 'recipe'],
             name='unique_recipe_in_user_favorite'
         )]
+        indexes = [models.Index(
+            fields=['user', '-id', 'recipe'],
+            name='favorite_user_recent_idx'
+        )]
         ordering = ('-id',)
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -191,6 +283,42 @@ class ShoppingList(models.Model):
             fields=['user', 'recipe'],
             name='unique_shopping_cart'
         )]
+        indexes = [models.Index(
+            fields=['user', '-id', 'recipe'],
+            name='shopping_user_recent_idx'
+        )]
         ordering = ('-id',)
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте пользователя, подписанного на много авторов.
+
+    Заполняется при создании рецепта, хранятся только FEED_SIZE
+    последних рецептов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'],
+            name='unique_feed_entry'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-recipe'],
+            name='feed_user_recent_idx'
+        )]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты'
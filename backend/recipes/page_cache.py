@@ -0,0 +1,141 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.metrics import count_cache
+
+from .reference_cache import CachedBody
+from .versions import bump_versions, get_version, get_versions
+
+LISTS_KEY = 'recipe_pages:lists'
+RECIPE_KEY = 'recipe_pages:recipe:{recipe_id}'
+CACHED_PARAMS = ('all_tags', 'author', 'cursor', 'limit', 'page', 'search',
+                 'tags')
+# Для анонимных запросов эти фильтры ничего не меняют.
+IGNORED_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def recipe_keys(recipe_ids):
+    return [RECIPE_KEY.format(recipe_id=pk) for pk in recipe_ids]
+
+
+def invalidate_recipe_pages(recipe_ids=(), lists=False):
+    keys = recipe_keys(list(recipe_ids))
+    if lists:
+        keys.append(LISTS_KEY)
+    transaction.on_commit(lambda: bump_versions(*keys))
+
+
+class PageEntry(CachedBody):
+    def __init__(self, versions, body, etag, last_modified):
+        super().__init__(0, body, etag, last_modified)
+        self.versions = versions
+
+    def response(self, request):
+        response = super().response(request)
+        patch_vary_headers(response, ('Authorization',))
+        response['X-Cache'] = 'HIT'
+        return response
+
+
+class RecipePageCache:
+    """Готовые ответы для анонимных пользователей в памяти процесса.
+
+    Запись помнит версии рецептов на странице, а для списков ещё и
+    общую версию списков. Изменение любой из них делает запись
+    недействительной. Размер ограничен, вытесняется самая старая по
+    обращению запись.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or settings.RECIPE_PAGE_CACHE_SIZE
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_key(self, request):
+        """Ключ из нормализованных параметров или None, если не кешируем."""
+        if (not request.user.is_anonymous
+                or request.accepted_renderer.format != 'json'):
+            return None
+        params = []
+        for name in sorted(request.query_params):
+            if name in IGNORED_PARAMS:
+                continue
+            if name not in CACHED_PARAMS:
+                return None
+            values = request.query_params.getlist(name)
+            if name == 'tags':
+                values = sorted({value.casefold() for value in values})
+            params.append(f'{name}={",".join(values)}')
+        return '|'.join((request.scheme, request.get_host(), request.path,
+                         '&'.join(params)))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            if get_versions(list(entry.versions)) == entry.versions:
+                with self.lock:
+                    self.hits += 1
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                count_cache('recipe_pages', hit=True)
+                return entry
+            with self.lock:
+                self.invalidations += 1
+                self.entries.pop(key, None)
+        with self.lock:
+            self.misses += 1
+        count_cache('recipe_pages', hit=False)
+        return None
+
+    def lists_version(self):
+        return {LISTS_KEY: get_version(LISTS_KEY)}
+
+    def recipe_versions(self, recipe_ids):
+        """Версии рецептов, читать до загрузки их из базы."""
+        return {key: get_version(key) for key in recipe_keys(recipe_ids)}
+
+    def set(self, key, data, validators, recipe_ids, versions):
+        """Сохраняет ответ с версиями, прочитанными до его сборки.
+
+        Если версия какого-то рецепта не была прочитана заранее,
+        ответ не сохраняется.
+        """
+        if not set(recipe_keys(recipe_ids)) <= versions.keys():
+            return None
+        entry = PageEntry(dict(versions), JSONRenderer().render(data),
+                          validators.etag, validators.last_modified)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+recipe_pages = RecipePageCache()
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                quote_etag)
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.metrics import count_cache
+
+from .versions import bump_versions, get_version
+
+
+def model_version_key(model):
+    return f'model_version:{model._meta.label_lower}'
+
+
+def get_model_version(model):
+    return get_version(model_version_key(model))
+
+
+def bump_model_version(model):
+    bump_versions(model_version_key(model))
+
+
+class CachedBody:
+    def __init__(self, version, body, etag=None, last_modified=None):
+        self.version = version
+        self.body = body
+        self.etag = etag or quote_etag(hashlib.md5(body).hexdigest())
+        if last_modified is None and version:
+            last_modified = version // 10 ** 9
+        self.last_modified = last_modified
+
+    def response(self, request):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(
+            request,
+            etag=self.etag,
+            last_modified=self.last_modified,
+            response=response,
+        )
+
+
+class ReferenceCache:
+    """Готовый JSON справочников в памяти процесса.
+
+    Запись действительна, пока версия модели в общем кеше не изменилась.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version:
+            count_cache('reference', hit=True)
+            return entry
+        count_cache('reference', hit=False)
+        return None
+
+    def set(self, key, version, data):
+        entry = CachedBody(version, JSONRenderer().render(data))
+        with self.lock:
+            self.entries[key] = entry
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+reference_cache = ReferenceCache()
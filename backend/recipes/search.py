@@ -0,0 +1,164 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+INDEX_BATCH_SIZE = 500
+SEARCH_TABLE = 'recipes_recipe_fts'
+INGREDIENT_NAMES_SQL = (
+    'SELECT {aggregate} FROM recipes_recipeingredient ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id'
+)
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), INDEX_BATCH_SIZE):
+        yield ids[start:start + INDEX_BATCH_SIZE]
+
+
+class RankedRecipeSearch:
+    """Совпадения и ранг добавляются в queryset подзапросами к индексу.
+
+    Остальные фильтры и пагинация применяются ко всем совпадениям,
+    а не к заранее отобранным лучшим.
+    """
+    # Для возрастающего ранга лучшие совпадения идут первыми.
+    rank_ordering = 'search_rank'
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        match_sql, rank_sql, params = self.get_sql(terms)
+        return queryset.filter(
+            id__in=RawSQL(match_sql, params)
+        ).annotate(
+            search_rank=RawSQL(rank_sql, params, output_field=FloatField())
+        ).order_by(self.rank_ordering, '-id')
+
+
+class PostgresRecipeSearch(RankedRecipeSearch):
+    """Поиск по столбцу tsvector с GIN-индексом.
+
+    Столбец заполняется из названия (вес A), ингредиентов (B)
+    и описания (C).
+    """
+    update_sql = (
+        'UPDATE recipes_recipe r SET search_vector = '
+        "setweight(to_tsvector(%s, r.name), 'A') || "
+        "setweight(to_tsvector(%s, COALESCE(("
+        + INGREDIENT_NAMES_SQL.format(aggregate="string_agg(i.name, ' ')")
+        + "), '')), 'B') || "
+        "setweight(to_tsvector(%s, r.text), 'C')"
+    )
+
+    def index(self, recipe_ids=None):
+        config = settings.SEARCH_CONFIG
+        with connection.cursor() as cursor:
+            if recipe_ids is None:
+                cursor.execute(self.update_sql, [config] * 3)
+                return
+            for batch in batches(recipe_ids):
+                cursor.execute(
+                    self.update_sql + ' WHERE r.id = ANY(%s)',
+                    [config] * 3 + [batch]
+                )
+
+    def remove(self, recipe_ids):
+        pass
+
+    rank_ordering = '-search_rank'
+
+    def get_sql(self, terms):
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return (
+            'SELECT id FROM recipes_recipe '
+            'WHERE search_vector @@ to_tsquery(%s, %s)',
+            'ts_rank(recipes_recipe.search_vector, to_tsquery(%s, %s))',
+            (settings.SEARCH_CONFIG, query),
+        )
+
+
+class SqliteRecipeSearch(RankedRecipeSearch):
+    """Поиск по теневой таблице FTS5, rowid совпадает с id рецепта."""
+    insert_sql = (
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, text, ingredients) '
+        'SELECT r.id, r.name, r.text, COALESCE(('
+        + INGREDIENT_NAMES_SQL.format(aggregate="group_concat(i.name, ' ')")
+        + "), '') FROM recipes_recipe r"
+    )
+    weights = (10.0, 1.0, 5.0)
+
+    def index(self, recipe_ids=None):
+        with connection.cursor() as cursor:
+            if recipe_ids is None:
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+                cursor.execute(self.insert_sql)
+                return
+            for batch in batches(recipe_ids):
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(
+                    f'DELETE FROM {SEARCH_TABLE} '
+                    f'WHERE rowid IN ({placeholders})', batch
+                )
+                cursor.execute(
+                    self.insert_sql + f' WHERE r.id IN ({placeholders})',
+                    batch
+                )
+
+    def remove(self, recipe_ids):
+        with connection.cursor() as cursor:
+            for batch in batches(recipe_ids):
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(
+                    f'DELETE FROM {SEARCH_TABLE} '
+                    f'WHERE rowid IN ({placeholders})', batch
+                )
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        # bm25() доступна только при обходе таблицы FTS5 по MATCH,
+        # поэтому индекс присоединяется к рецептам, а не подзапросом.
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={'search_rank': f'bm25({SEARCH_TABLE}, {weights})'},
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.rowid = recipes_recipe.id',
+                   f'{SEARCH_TABLE} MATCH %s'],
+            params=[match],
+        ).order_by(self.rank_ordering, '-id')
+
+
+class DefaultRecipeSearch:
+    def index(self, recipe_ids=None):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def search(self, queryset, query):
+        condition = Q()
+        for term in search_terms(query):
+            condition &= (Q(name__icontains=term)
+                          | Q(text__icontains=term)
+                          | Q(ingredients__name__icontains=term))
+        return queryset.filter(condition).distinct()
+
+
+def get_recipe_search():
+    if connection.vendor == 'postgresql':
+        return PostgresRecipeSearch()
+    if connection.vendor == 'sqlite':
+        return SqliteRecipeSearch()
+    return DefaultRecipeSearch()
@@ -1,11 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 
 from users.serializers import CustomUserSerializer
+from .cart import bump_recipe_carts
+from .fields import RecipeImageField
+from .images import renditions_exist, schedule_renditions, store_original
+from .membership import CART, FAVORITES, is_member
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingList, Tag)
+                     RecipeTag, ShoppingList, Tag)
 
 User = get_user_model()
 
@@ -44,9 +49,12 @@ class ShowRecipeIngredientsSerializer(serializers.ModelSerializer):
 
 
 class ShowRecipeSerializer(serializers.ModelSerializer):
+    image = RecipeImageField('full')
+    images = RecipeImageField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class ShowRecipeFullSerializer(serializers.ModelSerializer):
@@ -55,35 +63,30 @@ class ShowRecipeFullSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image = RecipeImageField('full')
+    images = RecipeImageField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time',
+            'name', 'image', 'images', 'text', 'cooking_time',
         )
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
+        ingredients = obj.recipeingredient_set.all()
         return ShowRecipeIngredientsSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return Favorite.objects.filter(recipe=obj, user=request.user).exists()
+        return is_member(self.context.get('request'), FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return ShoppingList.objects.filter(recipe=obj,
-                                           user=request.user).exists()
+        return is_member(self.context.get('request'), CART, obj.id)
 
 
 class AddRecipeIngredientsSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -95,9 +98,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
     author = CustomUserSerializer(read_only=True)
     ingredients = AddRecipeIngredientsSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -106,20 +107,22 @@ class AddRecipeSerializer(serializers.ModelSerializer):
                   'name', 'image', 'text', 'cooking_time')
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if not data:
             raise ValidationError('Не выбрано ни одного ингредиента!')
-        ingredients_ids = [ingredient['id'] for ingredient in ingredients]
-        if len(ingredients) != len(set(ingredients_ids)):
+        ingredients_ids = [ingredient['id'] for ingredient in data]
+        if len(data) != len(set(ingredients_ids)):
             raise serializers.ValidationError('Вы не можете добавить один '
                                               'ингредиент дважды')
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 0:
-                raise ValidationError('Количество должно быть положительным!')
-            pk = int(ingredient['id'])
-            if pk < 0:
-                raise ValidationError('id элемента не может быть '
-                                      'отрицательным')
+        if any(ingredient['amount'] <= 0 for ingredient in data):
+            raise ValidationError('Количество должно быть положительным!')
+        found = set(Ingredient.objects.filter(
+            id__in=ingredients_ids
+        ).values_list('id', flat=True))
+        missing = set(ingredients_ids) - found
+        if missing:
+            raise ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}'
+            )
         return data
 
     def validate_tags(self, data):
@@ -127,6 +130,12 @@ class AddRecipeSerializer(serializers.ModelSerializer):
             raise ValidationError('Необходимо отметить хотя бы один тег')
         if len(data) != len(set(data)):
             raise ValidationError('Один тег указан дважды')
+        found = set(Tag.objects.filter(
+            id__in=data
+        ).values_list('id', flat=True))
+        missing = set(data) - found
+        if missing:
+            raise ValidationError(f'Теги не найдены: {sorted(missing)}')
         return data
 
     def validate_cooking_time(self, data):
@@ -135,38 +144,78 @@ class AddRecipeSerializer(serializers.ModelSerializer):
                                   'числом, не менее 1 минуты!')
         return data
 
-    def add_recipe_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            if RecipeIngredient.objects.filter(
-                    recipe=recipe,
-                    ingredient=ingredient_id,
-            ).exists():
-                amount += ingredient['amount']
-            RecipeIngredient.objects.update_or_create(
-                recipe=recipe,
-                ingredient=ingredient_id,
-                defaults={'amount': amount},
+    def set_recipe_ingredients(self, recipe, ingredients):
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
             )
+        }
+        removed = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        )
+        transaction.on_commit(lambda: bump_recipe_carts([recipe.id]))
+
+    def store_image(self, validated_data):
+        if 'image' not in validated_data:
+            return
+        image_name, image_hash = store_original(validated_data['image'])
+        validated_data['image'] = image_name
+        validated_data['image_hash'] = image_hash
+        validated_data['image_renditions_ready'] = renditions_exist(
+            image_hash
+        )
+        if not validated_data['image_renditions_ready']:
+            schedule_renditions(image_name, image_hash)
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
+        self.store_image(validated_data)
         recipe = Recipe.objects.create(author=author, **validated_data)
-        self.add_recipe_ingredients(ingredients_data, recipe)
-        recipe.tags.set(tags_data)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient['id'],
+                             amount=ingredient['amount'])
+            for ingredient in ingredients_data
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in tags_data
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        if 'ingredients' in self.initial_data:
-            ingredients = validated_data.pop('ingredients')
-            recipe.ingredients.clear()
-            self.add_recipe_ingredients(ingredients, recipe)
-        if 'tags' in self.initial_data:
-            tags_data = validated_data.pop('tags')
-            recipe.tags.set(tags_data)
+        if 'ingredients' in validated_data:
+            self.set_recipe_ingredients(
+                recipe, validated_data.pop('ingredients')
+            )
+        if 'tags' in validated_data:
+            recipe.tags.set(validated_data.pop('tags'))
+        self.store_image(validated_data)
         return super().update(recipe, validated_data)
 
     def to_representation(self, recipe):
@@ -217,3 +266,9 @@ class ShoppingListSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         context = {'request': request}
         return ShowRecipeSerializer(instance.recipe, context=context).data
+
+
+class ShoppingCartSummarySerializer(serializers.Serializer):
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    amount = serializers.IntegerField()
@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cart import bump_cart_version, bump_recipe_carts
+from .feed import fan_out, rebuild_feed
+from .membership import CART, FAVORITES, FOLLOWING, update_members
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingList, Tag)
+from .page_cache import invalidate_recipe_pages
+from .reference_cache import bump_model_version
+from .search import get_recipe_search
+from users.counters import change_counter
+from users.models import Follow, User
+
+
+@receiver([post_save, post_delete], sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_cart_version(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_recipe_carts([instance.recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    transaction.on_commit(lambda: bump_recipe_carts(
+        RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values('recipe_id')
+    ))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Tag)
+def reference_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_model_version(sender))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User.objects.filter(pk=instance.author_id),
+                   'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def shopping_list_deleted(sender, instance, **kwargs):
+    change_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'in_carts_count', -1)
+
+
+def reindex_on_commit(recipe_ids):
+    transaction.on_commit(lambda: get_recipe_search().index(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_changed(sender, instance, **kwargs):
+    reindex_on_commit([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: get_recipe_search().remove([instance.id]))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_search_changed(sender, instance, **kwargs):
+    reindex_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        reindex_on_commit(list(RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)))
+
+
+MEMBERSHIP_RELATIONS = {
+    Favorite: (FAVORITES, 'recipe_id'),
+    ShoppingList: (CART, 'recipe_id'),
+    Follow: (FOLLOWING, 'author_id'),
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+def membership_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        relation, field = MEMBERSHIP_RELATIONS[sender]
+        update_members(relation, instance.user_id,
+                       added=[getattr(instance, field)])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Follow)
+def membership_removed(sender, instance, **kwargs):
+    relation, field = MEMBERSHIP_RELATIONS[sender]
+    update_members(relation, instance.user_id,
+                   removed=[getattr(instance, field)])
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=RecipeTag)
+def recipe_relation_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Recipe.objects.filter(pk=instance.recipe_id).touch()
+        if sender is RecipeTag:
+            invalidate_recipe_pages(lists=True)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_pages_changed(sender, instance, **kwargs):
+    invalidate_recipe_pages([instance.id], lists=True)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_recipes_changed(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        # Новое название меняет результаты поиска.
+        Recipe.objects.filter(ingredients=instance).touch(lists=True)
+
+
+@receiver(post_save, sender=Tag)
+def tag_recipes_changed(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        # Новый slug меняет результаты фильтра по тегам.
+        Recipe.objects.filter(tags=instance).touch(lists=True)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, raw, update_fields, **kwargs):
+    if created or raw or update_fields == frozenset(['last_login']):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_fan_out(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(
+            lambda: fan_out(instance.id, instance.author_id)
+        )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_feed_changed(sender, instance, raw=False, **kwargs):
+    if not raw and settings.FEED_FANOUT_THRESHOLD:
+        transaction.on_commit(lambda: rebuild_feed(instance.user_id))
@@ -0,0 +1,61 @@
+import threading
+
+from django.db.models import Count
+
+from .models import RecipeTag, Tag
+from .reference_cache import get_model_version
+
+
+class TagSlugMap:
+    """Соответствие slug -> id тегов с приведенным регистром.
+
+    Перестраивается при смене версии модели Tag в общем кеше.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.ids = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        version = get_model_version(Tag)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.ids = {
+                slug.casefold(): pk
+                for pk, slug in Tag.objects.order_by().values_list(
+                    'pk', 'slug'
+                )
+            }
+            self.version = version
+
+    def get_ids(self, slugs):
+        """Возвращает id известных тегов и признак, что найдены все."""
+        self.refresh()
+        ids = set()
+        found_all = True
+        for slug in slugs:
+            pk = self.ids.get(slug.casefold())
+            if pk is None:
+                found_all = False
+            else:
+                ids.add(pk)
+        return ids, found_all
+
+
+tag_slugs = TagSlugMap()
+
+
+def filter_by_tags(queryset, slugs, match_all=False):
+    ids, found_all = tag_slugs.get_ids(slugs)
+    if not ids or (match_all and not found_all):
+        return queryset.none()
+    recipes = RecipeTag.objects.filter(tag_id__in=ids)
+    if match_all and len(ids) > 1:
+        recipes = recipes.values('recipe_id').annotate(
+            matched=Count('tag_id')
+        ).filter(matched=len(ids))
+    return queryset.filter(id__in=recipes.values('recipe_id'))
@@ -0,0 +1,56 @@
+from django.db.models import Case, CharField, F, IntegerField, Value, When
+
+# Единица измерения -> (каноническая единица, множитель).
+UNITS = {
+    'г': ('г', 1),
+    'гр': ('г', 1),
+    'грамм': ('г', 1),
+    'кг': ('г', 1000),
+    'килограмм': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'литр': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'чайная ложка': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'столовая ложка': ('мл', 15),
+    'стакан': ('мл', 250),
+}
+
+
+def unit_aliases(unit):
+    aliases = {unit, unit.replace(' ', ''), unit.rstrip('.')}
+    aliases |= {alias.rstrip('.') + '.' for alias in aliases}
+    aliases |= {alias.capitalize() for alias in aliases}
+    return aliases
+
+
+def build_unit_groups(units):
+    groups = {}
+    for unit, conversion in units.items():
+        groups.setdefault(conversion, set()).update(unit_aliases(unit))
+    return tuple(
+        (unit, factor, tuple(sorted(aliases)))
+        for (unit, factor), aliases in groups.items()
+    )
+
+
+UNIT_GROUPS = build_unit_groups(UNITS)
+
+
+def canonical_unit(field):
+    return Case(
+        *(When(**{f'{field}__in': aliases}, then=Value(unit))
+          for unit, _, aliases in UNIT_GROUPS),
+        default=F(field),
+        output_field=CharField(),
+    )
+
+
+def unit_factor(field):
+    return Case(
+        *(When(**{f'{field}__in': aliases}, then=Value(factor))
+          for _, factor, aliases in UNIT_GROUPS if factor != 1),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
@@ -1,13 +1,12 @@
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 
+from .exporters import TextExporter
 
-def download_file_response(ingredients_list):
-    buy_list = []
-    for item in ingredients_list:
-        buy_list.append(f'{item["ingredient__name"]} - {item["amount"]} '
-                        f'{item["ingredient__measurement_unit"]} \n')
 
-    response = HttpResponse(buy_list, 'Content-Type: text/plain')
-    response['Content-Disposition'] = ('attachment; '
-                                       'filename="buylist.txt"')
+def download_file_response(ingredients_list, exporter=None):
+    exporter = exporter or TextExporter()
+    response = StreamingHttpResponse(exporter.stream(ingredients_list),
+                                     content_type=exporter.content_type)
+    filename = f'buylist.{exporter.extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
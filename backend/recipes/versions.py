@@ -0,0 +1,49 @@
+import time
+
+from django.core.cache import caches
+
+
+def get_cache():
+    return caches['versions']
+
+
+def get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_versions(*keys):
+    """Задает ключам новую общую версию и возвращает ее."""
+    # Новая версия уникальна, поэтому вытесненный из кеша ключ версии
+    # не может снова указать на устаревшие данные.
+    version = time.time_ns()
+    if keys:
+        get_cache().set_many(dict.fromkeys(keys, version), None)
+    return version
+
+
+def get_versions(keys):
+    """Текущие версии ключей, отсутствующих в кеше в ответе нет."""
+    return get_cache().get_many(keys)
+
+
+def incr_version(key):
+    """Увеличивает версию ключа на 1 и возвращает новую.
+
+    В Redis и memcached incr атомарен, поэтому версия на 1 больше
+    прежней значит, что между чтением и записью ключ никто не менял.
+    Файловый кеш читает и пишет отдельно, у него это окно остается.
+    """
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        if cache.add(key, version, None):
+            return version
+        return cache.incr(key)
@@ -1,23 +1,33 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import permissions, status, viewsets
+from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from .cart import bump_cart_version, get_shopping_cart
+from .catalog import NDJSON_CONTENT_TYPE, USER_SECTIONS, export_user_data
+from .etags import RecipeValidators
+from .exporters import EXPORTERS
+from .feed import get_feed
 from .filters import IngredientsFilter, RecipeFilter
-from .mixins import RetriveAndListViewSet
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingList, Tag)
+from .membership import CART, FAVORITES, update_members
+from .mixins import CachedRetriveAndListViewSet
+from .models import (Favorite, Ingredient, Recipe, ShoppingList, Tag,
+                     prefetch_recipe_relations)
+from .page_cache import recipe_pages
 from .permissions import IsAuthorOrAdmin
 from .serializers import (AddRecipeSerializer, FavouriteSerializer,
-                          IngredientsSerializer, ShoppingListSerializer,
-                          ShowRecipeFullSerializer, TagsSerializer)
+                          IngredientsSerializer, ShoppingCartSummarySerializer,
+                          ShoppingListSerializer, ShowRecipeFullSerializer,
+                          TagsSerializer)
 from .utils import download_file_response
-from users.paginator import CustomPageNumberPaginator
+from users.bulk import BulkIdsSerializer, bulk_add
+from users.paginator import CursorPaginator, CustomPageNumberPaginator
 
 
-class IngredientsViewSet(RetriveAndListViewSet):
+class IngredientsViewSet(CachedRetriveAndListViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = [permissions.AllowAny]
@@ -26,7 +36,7 @@ class IngredientsViewSet(RetriveAndListViewSet):
     pagination_class = None
 
 
-class TagsViewSet(RetriveAndListViewSet):
+class TagsViewSet(CachedRetriveAndListViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     permission_classes = [permissions.AllowAny]
@@ -41,6 +51,73 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     pagination_class = CustomPageNumberPaginator
 
+    def cached_for_anonymous(self, request, build, lists):
+        key = recipe_pages.make_key(request)
+        if key is None:
+            return build(request)[0]
+        entry = recipe_pages.get(key)
+        if entry is not None:
+            return entry.response(request)
+        # Версии читаются до запросов к базе: изменение, сохраненное во
+        # время сборки ответа, сделает запись недействительной.
+        versions = recipe_pages.lists_version() if lists else {}
+        response, recipes, validators = build(request, versions)
+        if response.status_code == status.HTTP_200_OK:
+            recipe_pages.set(key, response.data, validators,
+                             [recipe.id for recipe in recipes], versions)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def build_list(self, request, versions=None):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset) if page is None else page
+        if versions is not None:
+            versions.update(recipe_pages.recipe_versions(
+                recipe.id for recipe in recipes
+            ))
+        state = [request.accepted_renderer.format]
+        if page is not None:
+            state += [self.paginator.get_count(),
+                      self.paginator.get_next_link(),
+                      self.paginator.get_previous_link()]
+        validators = RecipeValidators(request, recipes, *state)
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return validators.apply(not_modified), recipes, validators
+        prefetch_recipe_relations(recipes)
+        serializer = self.get_serializer(recipes, many=True)
+        if page is None:
+            response = Response(serializer.data)
+        else:
+            response = self.get_paginated_response(serializer.data)
+        return validators.apply(response), recipes, validators
+
+    def build_detail(self, request, versions=None):
+        if versions is not None:
+            pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            versions.update(recipe_pages.recipe_versions([pk]))
+        recipe = self.get_object()
+        validators = RecipeValidators(request, [recipe],
+                                      request.accepted_renderer.format)
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return validators.apply(not_modified), [recipe], validators
+        prefetch_recipe_relations([recipe])
+        response = Response(self.get_serializer(recipe).data)
+        return validators.apply(response), [recipe], validators
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_for_anonymous(request, self.build_list, lists=True)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_for_anonymous(request, self.build_detail,
+                                         lists=False)
+
+    @action(detail=False, url_path='page_cache',
+            permission_classes=[permissions.IsAdminUser])
+    def page_cache_stats(self, request):
+        return Response(recipe_pages.stats())
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -102,12 +179,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def add_in_bulk(self, request, model, counter, relation):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            results, created = bulk_add(
+                model, request.user, 'recipe', Recipe.objects.all(),
+                serializer.validated_data['ids'], counter
+            )
+            update_members(relation, request.user.id, added=created)
+        return Response({'results': results}), created
+
+    @action(detail=False, methods=['post'], url_path='favorite/bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def favorite_bulk(self, request):
+        response, _ = self.add_in_bulk(request, Favorite, 'favorites_count',
+                                       FAVORITES)
+        return response
+
+    @action(detail=False, methods=['post'], url_path='shopping_cart/bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        response, created = self.add_in_bulk(request, ShoppingList,
+                                             'in_carts_count', CART)
+        if created:
+            bump_cart_version(request.user.id)
+        return response
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=EXPORTERS)
     def download_shopping_cart(self, request):
-        ingredients_list = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        return download_file_response(ingredients_list)
+        ingredients_list = get_shopping_cart(request.user.id)
+        return download_file_response(ingredients_list,
+                                      request.accepted_renderer)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        sections = list(dict.fromkeys(
+            request.query_params.getlist('section')
+        )) or USER_SECTIONS
+        unknown = set(sections) - set(USER_SECTIONS)
+        if unknown:
+            raise serializers.ValidationError(
+                {'section': f'Неизвестные разделы: {", ".join(unknown)}'}
+            )
+        response = StreamingHttpResponse(
+            export_user_data(request, sections),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="foodgram.ndjson"'
+        )
+        return response
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        paginator = CursorPaginator()
+        recipes = paginator.paginate_queryset(get_feed(request.user),
+                                              request, self)
+        prefetch_recipe_relations(recipes)
+        serializer = ShowRecipeFullSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, url_path='shopping_cart/summary',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_summary(self, request):
+        serializer = ShoppingCartSummarySerializer(
+            get_shopping_cart(request.user.id), many=True
+        )
+        return Response(serializer.data)
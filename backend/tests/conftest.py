@@ -0,0 +1,92 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.membership import get_backend
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, RecipeTag,
+                            Tag)
+from recipes.page_cache import recipe_pages
+from recipes.reference_cache import reference_cache
+from users.models import User
+
+LOCMEM_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(settings):
+    """Кеш в памяти вместо общего и пустые кеши процесса."""
+    settings.CACHES = {alias: dict(LOCMEM_CACHE, LOCATION=f'tests-{alias}')
+                       for alias in settings.CACHES}
+    settings.METRICS_ENABLED = False
+    from django.core.cache import caches
+    for cache in caches.all():
+        cache.clear()
+    reference_cache.clear()
+    recipe_pages.clear()
+    get_backend.cache_clear()
+    yield
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        username='reader', email='reader@example.com', password='pass',
+        first_name='Читатель', last_name='Тестовый',
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast'),
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+        Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner'),
+    ]
+
+
+@pytest.fixture
+def make_recipes(db, tags):
+    """Создает рецепты с тегами и ингредиентами, возвращает их список."""
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {number}',
+                                  measurement_unit='г')
+        for number in range(3)
+    ]
+    created = []
+
+    def make(count, author=None, recipe_tags=None):
+        author = author or User.objects.create_user(
+            username=f'author{len(created)}',
+            email=f'author{len(created)}@example.com',
+            password='pass', first_name='Автор', last_name='Тестовый',
+        )
+        recipes = []
+        for _ in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {len(created)}', text='Текст',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+            for tag in tags if recipe_tags is None else recipe_tags:
+                RecipeTag.objects.create(recipe=recipe, tag=tag)
+            created.append(recipe)
+            recipes.append(recipe)
+        return recipes
+
+    return make
@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+
+from recipes.benchmarks import compare
+from recipes.page_cache import LISTS_KEY
+from recipes.versions import get_version
+
+
+def result(p95, queries):
+    return {'p50': p95, 'p95': p95, 'p99': p95, 'queries': queries}
+
+
+def test_compare_reports_slowdown_and_extra_queries():
+    baseline = {'slow': result(10, 2), 'queries': result(10, 2),
+                'noise': result(1, 2)}
+    _, regressions = compare({
+        'slow': result(16, 2),
+        'queries': result(10, 3),
+        'noise': result(2.5, 2),
+    }, baseline, 0.5)
+    assert regressions == ['slow', 'queries']
+
+
+def test_compare_without_tolerance_checks_only_queries():
+    baseline = {'slow': result(10, 2), 'queries': result(10, 2)}
+    _, regressions = compare({
+        'slow': result(100, 2), 'queries': result(10, 3),
+    }, baseline)
+    assert regressions == ['queries']
+
+
+def test_generate_benchmark_data_keeps_foreign_cache_keys(transactional_db):
+    for cache in caches.all():
+        cache.set('foreign', 1)
+    lists_version = get_version(LISTS_KEY)
+    call_command('generate_benchmark_data', users=3, recipes=5, favorites=2,
+                 cart=1, follows=1, stdout=StringIO())
+    assert all(cache.get('foreign') == 1 for cache in caches.all())
+    assert get_version(LISTS_KEY) != lists_version
@@ -0,0 +1,68 @@
+import pytest
+
+from recipes.cart import get_cart_version
+from recipes.membership import CART, FAVORITES, FOLLOWING, get_backend
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.models import Follow, User
+
+MISSING_ID = 10 ** 6
+
+
+@pytest.mark.parametrize('url, model, counter, relation', [
+    ('/api/recipes/favorite/bulk/', Favorite, 'favorites_count', FAVORITES),
+    ('/api/recipes/shopping_cart/bulk/', ShoppingList, 'in_carts_count',
+     CART),
+])
+def test_recipes_bulk_add(url, model, counter, relation, transactional_db,
+                          make_recipes, user, user_client):
+    first, second = make_recipes(2)
+    model.objects.create(user=user, recipe=first)
+    # Множество загружается до вставки и должно ее увидеть.
+    assert get_backend().get(relation, user.id) == {first.id}
+    response = user_client.post(url, {
+        'ids': [first.id, second.id, MISSING_ID, second.id],
+    }, format='json')
+    assert response.status_code == 200
+    assert response.data['results'] == [
+        {'id': first.id, 'status': 'exists'},
+        {'id': second.id, 'status': 'created'},
+        {'id': MISSING_ID, 'status': 'not_found'},
+    ]
+    assert model.objects.filter(user=user).count() == 2
+    assert getattr(Recipe.objects.get(pk=second.pk), counter) == 1
+    assert get_backend().get(relation, user.id) == {first.id, second.id}
+
+
+def test_shopping_cart_bulk_bumps_cart_version(transactional_db,
+                                               make_recipes, user,
+                                               user_client):
+    recipe = make_recipes(1)[0]
+    version = get_cart_version(user.id)
+    url = '/api/recipes/shopping_cart/summary/'
+    assert user_client.get(url).data == []
+    user_client.post('/api/recipes/shopping_cart/bulk/',
+                     {'ids': [recipe.id]}, format='json')
+    assert get_cart_version(user.id) != version
+    assert len(user_client.get(url).data) == 3
+
+
+def test_subscribe_bulk(transactional_db, make_recipes, user, user_client):
+    author = make_recipes(1)[0].author
+    assert get_backend().get(FOLLOWING, user.id) == set()
+    response = user_client.post('/api/users/subscribe/bulk/', {
+        'ids': [user.id, author.id, MISSING_ID],
+    }, format='json')
+    assert response.status_code == 200
+    assert response.data['results'] == [
+        {'id': user.id, 'status': 'self'},
+        {'id': author.id, 'status': 'created'},
+        {'id': MISSING_ID, 'status': 'not_found'},
+    ]
+    assert Follow.objects.filter(user=user).count() == 1
+    assert User.objects.get(pk=user.pk).following_count == 1
+    assert User.objects.get(pk=author.pk).followers_count == 1
+    assert get_backend().get(FOLLOWING, user.id) == {author.id}
+    again = user_client.post('/api/users/subscribe/bulk/',
+                             {'ids': [author.id]}, format='json')
+    assert again.data['results'] == [{'id': author.id, 'status': 'exists'}]
+    assert User.objects.get(pk=user.pk).following_count == 1
@@ -0,0 +1,110 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from recipes import catalog
+from recipes.catalog import CatalogImporter, read_json_array
+from recipes.models import (FeedEntry, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, Tag)
+from users.models import Follow, User
+
+
+class CountingFile(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_read_json_array_joins_records_split_between_chunks(monkeypatch):
+    monkeypatch.setattr(catalog, 'READ_SIZE', 7)
+    records = [{'name': 'длинное название ' * 3, 'amount': 12,
+                'ready': True}] * 3
+    assert list(read_json_array(io.StringIO(json.dumps(records)))) == records
+
+
+def test_read_json_array_stops_at_syntax_error(monkeypatch):
+    monkeypatch.setattr(catalog, 'READ_SIZE', 64)
+    file = CountingFile('[{"name": "соль", oops}, ' + '{"name": "перец"}, '
+                        * 100 + '{}]')
+    with pytest.raises(json.JSONDecodeError):
+        list(read_json_array(file))
+    assert file.reads == 1
+
+
+@pytest.mark.parametrize('cooking_time, valid', [
+    (None, False), (1, False), (4, False), (5, True), ('30', True),
+    (1440, True), (1441, False), ('долго', False),
+])
+def test_parse_recipe_validates_cooking_time(user, cooking_time, valid):
+    record = {
+        'name': 'Суп', 'author': user.username,
+        'ingredients': [{'name': 'вода', 'measurement_unit': 'мл',
+                         'amount': 500}],
+    }
+    if cooking_time is not None:
+        record['cooking_time'] = cooking_time
+    result = CatalogImporter().parse_recipe(record)
+    assert (result is not None) == valid
+    if valid:
+        assert result[0].cooking_time == int(cooking_time)
+
+
+def test_import_adds_recipes_to_stored_feeds(user, settings):
+    settings.FEED_FANOUT_THRESHOLD = 1
+    author = User.objects.create_user(
+        username='author', email='author@example.com', password='pass',
+        first_name='Автор', last_name='Тестовый',
+    )
+    Follow.objects.create(user=user, author=author)
+    User.objects.filter(pk=user.pk).update(following_count=1)
+    importer = CatalogImporter(default_author=author.username)
+    importer.add_batch([{
+        'name': 'Суп', 'cooking_time': 30,
+        'ingredients': [{'name': 'вода', 'measurement_unit': 'мл',
+                         'amount': 500}],
+    }])
+    importer.finish()
+    assert list(FeedEntry.objects.filter(user=user).values_list(
+        'recipe_id', flat=True
+    )) == importer.recipe_ids
+
+
+def test_repeated_import_creates_nothing(user, tmp_path):
+    ingredients = [{'name': 'соль', 'measurement_unit': 'г', 'amount': 5},
+                   {'name': 'вода', 'measurement_unit': 'мл', 'amount': 500}]
+    path = tmp_path / 'catalog.json'
+    path.write_text(json.dumps([
+        {'section': 'tags', 'name': 'Обед', 'color': '#49B64E',
+         'slug': 'lunch'},
+        {'name': 'соль', 'measurement_unit': 'г'},
+        # Та же соль в другой единице измерения - другой ингредиент.
+        {'name': 'соль', 'measurement_unit': 'шт.'},
+        {'name': 'соль', 'measurement_unit': 'г'},
+        {'name': 'Суп', 'cooking_time': 30, 'tags': ['lunch'],
+         'ingredients': ingredients},
+        {'name': 'Рассол', 'cooking_time': 10, 'ingredients': ingredients},
+        {'name': 'Суп', 'cooking_time': 40, 'ingredients': ingredients},
+    ], ensure_ascii=False))
+    models = (Tag, Ingredient, Recipe, RecipeIngredient, RecipeTag)
+
+    def load():
+        output = io.StringIO()
+        call_command('import_catalog', str(path), author=user.username,
+                     batch_size=2, stdout=output)
+        return [model.objects.count() for model in models], output.getvalue()
+
+    counts, _ = load()
+    assert counts == [1, 3, 2, 4, 1]
+    assert sorted(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) == [('вода', 'мл'), ('соль', 'г'), ('соль', 'шт.')]
+    assert Recipe.objects.get(name='Суп').cooking_time == 30
+    again, output = load()
+    assert again == counts
+    assert 'тегов 0, ингредиентов 0, рецептов 0, пропущено 3' in output
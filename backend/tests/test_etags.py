@@ -0,0 +1,59 @@
+import pytest
+
+from recipes import views
+from recipes.models import Favorite, RecipeIngredient, RecipeTag, ShoppingList
+
+URLS = ('/api/recipes/{id}/', '/api/recipes/')
+
+
+@pytest.fixture
+def recipe(make_recipes):
+    return make_recipes(1)[0]
+
+
+def get_etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response['ETag']
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_matching_etag_skips_serialization(url, recipe, user_client,
+                                           monkeypatch):
+    url = url.format(id=recipe.id)
+    etag = get_etag(user_client, url)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Ответ 304 не должен сериализоваться')
+
+    monkeypatch.setattr(views.RecipeViewSet, 'get_serializer', fail)
+    monkeypatch.setattr(views, 'prefetch_recipe_relations', fail)
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+
+@pytest.mark.parametrize('url', URLS)
+@pytest.mark.parametrize('change', ['amount', 'tag'])
+def test_recipe_relation_change_changes_etag(url, change, recipe,
+                                             user_client):
+    url = url.format(id=recipe.id)
+    etag = get_etag(user_client, url)
+    if change == 'amount':
+        link = RecipeIngredient.objects.filter(recipe=recipe).first()
+        link.amount = 300
+        link.save()
+    else:
+        RecipeTag.objects.filter(recipe=recipe).first().delete()
+    assert get_etag(user_client, url) != etag
+    assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.parametrize('url', URLS)
+@pytest.mark.parametrize('model', [Favorite, ShoppingList])
+def test_viewer_flags_change_etag(url, model, transactional_db, recipe, user,
+                                  user_client):
+    url = url.format(id=recipe.id)
+    etag = get_etag(user_client, url)
+    model.objects.create(user=user, recipe=recipe)
+    assert get_etag(user_client, url) != etag
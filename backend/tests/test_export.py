@@ -0,0 +1,14 @@
+import json
+
+from recipes.models import Favorite
+
+
+def test_repeated_section_is_exported_once(make_recipes, user, user_client):
+    for recipe in make_recipes(2):
+        Favorite.objects.create(user=user, recipe=recipe)
+    response = user_client.get('/api/recipes/export/',
+                               {'section': ['favorites', 'favorites']})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in
+             b''.join(response.streaming_content).decode().splitlines()]
+    assert [line['section'] for line in lines] == ['favorites'] * 2
@@ -0,0 +1,61 @@
+from recipes import membership
+from recipes.membership import (FAVORITES, LocalMembershipBackend, LocalRedis,
+                                RedisMembershipBackend)
+from recipes.models import Favorite
+
+
+def test_update_drops_set_changed_by_another_worker(make_recipes, user):
+    first, second = make_recipes(2)
+    Favorite.objects.create(user=user, recipe=second)
+    worker_a = LocalMembershipBackend()
+    worker_b = LocalMembershipBackend()
+    assert worker_a.get(FAVORITES, user.id) == {second.id}
+    # Другой процесс добавляет рецепт, пока у первого старое множество.
+    Favorite.objects.create(user=user, recipe=first)
+    worker_b.update(FAVORITES, user.id, added=[first.id])
+    Favorite.objects.filter(recipe=second).delete()
+    worker_a.update(FAVORITES, user.id, removed=[second.id])
+    assert worker_a.get(FAVORITES, user.id) == {first.id}
+    assert worker_b.get(FAVORITES, user.id) == {first.id}
+
+
+def test_update_applies_delta_to_current_set(make_recipes, user,
+                                             django_assert_num_queries):
+    recipe = make_recipes(1)[0]
+    backend = LocalMembershipBackend()
+    assert backend.get(FAVORITES, user.id) == set()
+    Favorite.objects.create(user=user, recipe=recipe)
+    backend.update(FAVORITES, user.id, added=[recipe.id])
+    with django_assert_num_queries(0):
+        assert backend.get(FAVORITES, user.id) == {recipe.id}
+
+
+def test_redis_get_does_not_store_set_changed_while_loading(
+        make_recipes, user, monkeypatch):
+    recipe = make_recipes(1)[0]
+    backend = RedisMembershipBackend(LocalRedis())
+    load = membership.load_members
+
+    def load_and_change(relation, user_id):
+        members = load(relation, user_id)
+        # Другой процесс добавляет рецепт после чтения из базы.
+        Favorite.objects.create(user=user, recipe=recipe)
+        backend.update(relation, user_id, added=[recipe.id])
+        return members
+
+    monkeypatch.setattr(membership, 'load_members', load_and_change)
+    assert backend.get(FAVORITES, user.id) == set()
+    monkeypatch.setattr(membership, 'load_members', load)
+    assert backend.get(FAVORITES, user.id) == {recipe.id}
+
+
+def test_redis_update_resets_stored_set(make_recipes, user):
+    first, second = make_recipes(2)
+    Favorite.objects.create(user=user, recipe=first)
+    backend = RedisMembershipBackend(LocalRedis())
+    assert backend.get(FAVORITES, user.id) == {first.id}
+    Favorite.objects.filter(recipe=first).delete()
+    Favorite.objects.create(user=user, recipe=second)
+    backend.update(FAVORITES, user.id, added=[second.id],
+                   removed=[first.id])
+    assert backend.get(FAVORITES, user.id) == {second.id}
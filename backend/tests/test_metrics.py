@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from django.urls import reverse
+
+from foodgram import metrics as metrics_module
+from foodgram.metrics import RETIRED_FILE, MetricsStore, metrics
+from recipes.models import ShoppingList
+
+
+@pytest.fixture
+def metrics_dir(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    return tmp_path
+
+
+def write_worker_file(directory, file_name, value):
+    (directory / file_name).write_text(json.dumps({
+        'counters': [['requests', '[]', value]],
+        'histograms': [],
+    }))
+
+
+def test_dead_worker_files_are_merged_into_retired(metrics_dir,
+                                                   monkeypatch):
+    monkeypatch.setattr(metrics_module, 'is_alive', lambda pid: pid == 1)
+    write_worker_file(metrics_dir, '1-100.json', 1)
+    write_worker_file(metrics_dir, '2-100.json', 2)
+    # Старый файл процесса, чей pid занял новый воркер.
+    write_worker_file(metrics_dir, '1-50.json', 4)
+    store = MetricsStore()
+    counters, _ = store.collect()
+    assert counters[('requests', '[]')] == 7
+    assert sorted(path.name for path in metrics_dir.glob('*.json')) == [
+        '1-100.json', store.file_name, RETIRED_FILE,
+    ]
+    counters, _ = store.collect()
+    assert counters[('requests', '[]')] == 7
+
+
+def test_worker_file_is_keyed_by_start_time(metrics_dir):
+    first = MetricsStore()
+    second = MetricsStore()
+    assert first.pid == second.pid
+    assert first.file_name != second.file_name
+
+
+def test_metrics_view_is_hidden_when_disabled(client, settings):
+    settings.METRICS_ENABLED = False
+    assert client.get(reverse('metrics')).status_code == 404
+
+
+def test_streamed_response_queries_are_recorded(metrics_dir, settings,
+                                                make_recipes, user,
+                                                user_client):
+    settings.METRICS_ENABLED = True
+    ShoppingList.objects.create(user=user, recipe=make_recipes(1)[0])
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    b''.join(response.streaming_content)
+    counters, _ = metrics.collect()
+    labels = json.dumps([['view', 'recipes-download-shopping-cart']])
+    # Проверка токена и сборка списка покупок во время отдачи файла.
+    assert counters[('foodgram_db_queries_total', labels)] == 2
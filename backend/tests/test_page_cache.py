@@ -0,0 +1,75 @@
+import pytest
+
+from recipes import views
+from recipes.models import Recipe
+from recipes.page_cache import recipe_keys
+from recipes.search import get_recipe_search
+from recipes.versions import bump_versions
+
+
+@pytest.fixture
+def edit_during_build(monkeypatch):
+    """Правка рецепта, сохраненная между чтением из базы и записью в кеш."""
+    def edit(recipe):
+        prefetch = views.prefetch_recipe_relations
+
+        def prefetch_and_edit(recipes):
+            prefetch(recipes)
+            Recipe.objects.filter(pk=recipe.pk).update(name='Новое название')
+            bump_versions(*recipe_keys([recipe.pk]))
+            monkeypatch.setattr(views, 'prefetch_recipe_relations', prefetch)
+
+        monkeypatch.setattr(views, 'prefetch_recipe_relations',
+                            prefetch_and_edit)
+    return edit
+
+
+@pytest.mark.parametrize('url', ['/api/recipes/{id}/', '/api/recipes/'])
+def test_edit_during_build_is_not_cached(url, make_recipes, anonymous_client,
+                                         edit_during_build):
+    recipe = make_recipes(1)[0]
+    url = url.format(id=recipe.id)
+    edit_during_build(recipe)
+    first = anonymous_client.get(url)
+    assert first['X-Cache'] == 'MISS'
+    second = anonymous_client.get(url)
+    assert second['X-Cache'] == 'MISS'
+    assert 'Новое название' in second.content.decode()
+    assert anonymous_client.get(url)['X-Cache'] == 'HIT'
+
+
+def test_detail_with_unnormalized_id_is_not_cached(make_recipes,
+                                                   anonymous_client):
+    recipe = make_recipes(1)[0]
+    url = f'/api/recipes/0{recipe.id}/'
+    assert anonymous_client.get(url).status_code == 200
+    assert anonymous_client.get(url)['X-Cache'] == 'MISS'
+
+
+def test_tag_slug_change_resets_cached_lists(transactional_db, make_recipes,
+                                             tags, anonymous_client):
+    make_recipes(2, recipe_tags=[tags[0]])
+    url = '/api/recipes/?tags=morning'
+    assert anonymous_client.get(url).data['count'] == 0
+    assert anonymous_client.get(url)['X-Cache'] == 'HIT'
+    tags[0].slug = 'morning'
+    tags[0].save()
+    response = anonymous_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['count'] == 2
+
+
+def test_ingredient_rename_resets_cached_search(transactional_db,
+                                                make_recipes,
+                                                anonymous_client):
+    recipe = make_recipes(2)[0]
+    get_recipe_search().index()
+    url = '/api/recipes/?search=шафран'
+    assert anonymous_client.get(url).data['count'] == 0
+    assert anonymous_client.get(url)['X-Cache'] == 'HIT'
+    ingredient = recipe.ingredients.first()
+    ingredient.name = 'шафран'
+    ingredient.save()
+    response = anonymous_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert response.data['count'] == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from users.models import Follow
+from users.paginator import CustomPageNumberPaginator
+
+
+def test_cursor_pages_follow_each_other(make_recipes, anonymous_client):
+    recipes = make_recipes(5)
+    seen = []
+    response = anonymous_client.get('/api/recipes/', {'cursor': '',
+                                                      'limit': 2})
+    while True:
+        assert response.status_code == 200
+        seen += [recipe['id'] for recipe in response.data['results']]
+        if not response.data['next']:
+            break
+        response = anonymous_client.get(response.data['next'])
+    assert seen == sorted((recipe.id for recipe in recipes), reverse=True)
+    previous = anonymous_client.get(response.data['previous'])
+    assert [recipe['id'] for recipe in previous.data['results']] == seen[2:4]
+
+
+def test_cursor_on_empty_queryset(make_recipes, anonymous_client):
+    make_recipes(2)
+    response = anonymous_client.get('/api/recipes/',
+                                    {'tags': 'unknown', 'cursor': ''})
+    assert response.status_code == 200
+    assert response.data['count'] == 0
+    assert response.data['results'] == []
+
+
+def test_filtered_cursor_count_is_not_cached(make_recipes, user,
+                                             user_client):
+    author = make_recipes(3)[0].author
+    response = user_client.get('/api/recipes/feed/')
+    assert response.data['results'] == []
+    Follow.objects.create(user=user, author=author)
+    response = user_client.get('/api/recipes/feed/')
+    assert response.data['count'] is None
+    assert len(response.data['results']) == 3
+
+
+def test_invalid_cursor(anonymous_client, db):
+    response = anonymous_client.get('/api/recipes/', {'cursor': 'не курсор'})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('cursor', [{}, {'cursor': ''}])
+def test_page_size_is_capped(cursor, make_recipes, anonymous_client,
+                             monkeypatch):
+    make_recipes(3)
+    monkeypatch.setattr(CustomPageNumberPaginator, 'max_page_size', 2)
+    response = anonymous_client.get('/api/recipes/', {'limit': 1000,
+                                                      **cursor})
+    assert len(response.data['results']) == 2
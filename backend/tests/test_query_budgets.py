@@ -0,0 +1,89 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram import query_budget as query_budget_module
+from foodgram.query_budget import BUDGETS, QueryBudgetExceeded, query_budget
+from recipes.models import Recipe, ShoppingList
+from users.models import User
+
+# Маленькая и большая страница: число запросов не должно отличаться.
+PAGE_SIZES = (1, 30)
+REQUESTS = [
+    request
+    for size in PAGE_SIZES
+    for request in (
+        ('recipes-list', '/api/recipes/', {'limit': size}),
+        ('recipes-feed', '/api/recipes/feed/', {'limit': size}),
+        ('subscription', '/api/users/subscriptions/', {
+            'limit': size, 'recipes_limit': size,
+        }),
+        ('user-list', '/api/users/', {'limit': size}),
+        ('ingredients-list', '/api/ingredients/', {
+            'name': 'ка', 'limit': size,
+        }),
+    )
+] + [
+    ('recipes-list', '/api/recipes/', {'is_favorited': 1}),
+    ('recipes-list', '/api/recipes/', {'tags': 'breakfast'}),
+    ('recipes-detail', '/api/recipes/{recipe}/', {}),
+    ('recipes-download-shopping-cart',
+     '/api/recipes/download_shopping_cart/', {}),
+    ('user-detail', '/api/users/{author}/', {}),
+    ('user-me', '/api/users/me/', {}),
+    ('tags-list', '/api/tags/', {}),
+]
+
+
+@pytest.fixture
+def benchmark_client(db):
+    call_command('generate_benchmark_data', users=12, recipes=60,
+                 favorites=10, cart=5, follows=8, stdout=StringIO())
+    user = User.objects.annotate(
+        follows=Count('follower', distinct=True),
+        cart=Count('shopping_list', distinct=True),
+    ).filter(follows__gt=0, cart__gt=0).order_by('id').first()
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    client.user = user
+    return client
+
+
+def test_every_budget_is_checked():
+    assert {view_name for view_name, _, _ in REQUESTS} == set(BUDGETS)
+
+
+@pytest.mark.parametrize('view_name, path, params', REQUESTS)
+def test_view_fits_query_budget(benchmark_client, view_name, path, params):
+    path = path.format(
+        recipe=Recipe.objects.order_by('id').first().id,
+        author=User.objects.exclude(
+            pk=benchmark_client.user.pk
+        ).order_by('id').first().id,
+    )
+    # Первый запрос прогревает кеши версий и членства.
+    benchmark_client.get(path, params)
+    with query_budget(view_name):
+        response = benchmark_client.get(path, params)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    assert response.status_code == 200
+    assert response.resolver_match.view_name == view_name
+
+
+def test_middleware_checks_streamed_response(settings, monkeypatch,
+                                             make_recipes, user,
+                                             user_client):
+    settings.QUERY_BUDGET_MODE = 'fail'
+    monkeypatch.setitem(query_budget_module.BUDGETS,
+                        'recipes-download-shopping-cart', 1)
+    ShoppingList.objects.create(user=user, recipe=make_recipes(1)[0])
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    with pytest.raises(QueryBudgetExceeded):
+        b''.join(response.streaming_content)
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+from django.db import connection
+
+from recipes.feed import followed_recipes, stored_recipes
+from recipes.models import Favorite, FeedEntry, Recipe, ShoppingList
+from users.models import Follow, User
+
+FULL_SCAN = {
+    'sqlite': r'\bSCAN (TABLE )?({tables})\b',
+    'postgresql': r'Seq Scan on ({tables})\b',
+}
+CHECKED_TABLES = (Favorite._meta.db_table, ShoppingList._meta.db_table,
+                  Follow._meta.db_table, FeedEntry._meta.db_table)
+USER = User(pk=0)
+QUERIES = {
+    'is_favorited': lambda: Recipe.objects.favorited_by(USER)[:6],
+    'is_in_shopping_cart': lambda: Recipe.objects.in_cart_of(USER)[:6],
+    'favorites_recent': lambda: Favorite.objects.filter(user=USER)[:6],
+    'shopping_recent': lambda: ShoppingList.objects.filter(user=USER)[:6],
+    'feed_read': lambda: followed_recipes(USER.pk).order_by('-id')[:6],
+    'feed_stored': lambda: stored_recipes(USER.pk).order_by('-id')[:6],
+}
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_relation_tables_are_not_scanned(name, db):
+    """Таблицы связей читаются только по индексу."""
+    pattern = FULL_SCAN.get(connection.vendor)
+    if pattern is None:
+        pytest.skip(f'Проверка не поддерживается для {connection.vendor}')
+    if connection.vendor == 'postgresql':
+        # На маленьких таблицах планировщик выбирает Seq Scan,
+        # нас интересует только наличие подходящего индекса.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    full_scan = re.compile(
+        pattern.format(tables='|'.join(CHECKED_TABLES)), re.IGNORECASE
+    )
+    plan = QUERIES[name]().explain()
+    assert not full_scan.search(plan), plan
+
+
+@pytest.mark.parametrize('param, model', [
+    ('is_favorited', Favorite),
+    ('is_in_shopping_cart', ShoppingList),
+])
+def test_relation_filters(param, model, make_recipes, user, user_client):
+    recipes = make_recipes(3)
+    model.objects.create(user=user, recipe=recipes[0])
+    model.objects.create(user=User.objects.exclude(pk=user.pk).first(),
+                         recipe=recipes[1])
+    response = user_client.get('/api/recipes/', {param: 1})
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        recipes[0].id
+    ]
+    response = user_client.get('/api/recipes/', {param: 0})
+    assert response.data['count'] == 3
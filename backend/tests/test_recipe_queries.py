@@ -0,0 +1,49 @@
+import pytest
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Follow
+
+# Токен с пользователем, рецепты (для списка еще их число), теги,
+# авторы и ингредиенты. Отметки пользователя берутся из кеша.
+LIST_QUERIES = 6
+DETAIL_QUERIES = 5
+
+
+@pytest.fixture
+def recipes_with_flags(make_recipes, user):
+    def make(count):
+        recipes = make_recipes(count)
+        Follow.objects.create(user=user, author=recipes[0].author)
+        for recipe in recipes:
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingList.objects.create(user=user, recipe=recipe)
+        return recipes
+    return make
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+        count, recipes_with_flags, user_client, django_assert_num_queries):
+    recipes_with_flags(count)
+    # Первый запрос загружает множества избранного, покупок и подписок.
+    user_client.get('/api/recipes/')
+    with django_assert_num_queries(LIST_QUERIES):
+        response = user_client.get('/api/recipes/', {'limit': count})
+    assert response.status_code == 200
+    assert len(response.data['results']) == count
+    assert all(recipe['is_favorited'] and recipe['is_in_shopping_cart']
+               and recipe['author']['is_subscribed']
+               for recipe in response.data['results'])
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_recipe_detail_queries_are_constant(
+        count, recipes_with_flags, user_client, django_assert_num_queries):
+    recipe = recipes_with_flags(count)[-1]
+    url = f'/api/recipes/{recipe.id}/'
+    user_client.get(url)
+    with django_assert_num_queries(DETAIL_QUERIES):
+        response = user_client.get(url)
+    assert response.status_code == 200
+    assert len(response.data['ingredients']) == 3
+    assert len(response.data['tags']) == 3
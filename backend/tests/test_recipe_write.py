@@ -0,0 +1,111 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.cart import get_cart_version
+from recipes.models import Ingredient, RecipeIngredient, ShoppingList
+
+
+def make_image():
+    output = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(output, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(output.getvalue()).decode())
+
+
+# Не зависят от числа ингредиентов и тегов: связи пишутся пачками.
+CREATE_QUERIES = 10
+UPDATE_QUERIES = 14
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture
+def recipe(make_recipes):
+    return make_recipes(1)[0]
+
+
+@pytest.fixture
+def author_client(recipe):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=(
+        f'Token {Token.objects.create(user=recipe.author).key}'
+    ))
+    return client
+
+
+def amounts(recipe):
+    return dict(RecipeIngredient.objects.filter(recipe=recipe).values_list(
+        'ingredient__name', 'amount'
+    ))
+
+
+def test_create_writes_relations_in_bulk(recipe, tags, author_client,
+                                         django_assert_num_queries):
+    ids = list(Ingredient.objects.values_list('id', flat=True))
+    with django_assert_num_queries(CREATE_QUERIES):
+        response = author_client.post('/api/recipes/', {
+            'name': 'Новый', 'text': 'Текст', 'cooking_time': 15,
+            'image': make_image(), 'tags': [tag.id for tag in tags],
+            'ingredients': [{'id': pk, 'amount': 50} for pk in ids],
+        }, format='json')
+    assert response.status_code == 201
+    assert RecipeIngredient.objects.filter(
+        recipe_id=response.data['id']
+    ).count() == len(ids)
+
+
+def test_update_writes_only_the_difference(recipe, author_client,
+                                           django_assert_num_queries):
+    kept, changed, removed = recipe.ingredients.order_by('id')
+    added = Ingredient.objects.create(name='новый', measurement_unit='г')
+    with django_assert_num_queries(UPDATE_QUERIES):
+        response = author_client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': kept.id, 'amount': 100},
+                {'id': changed.id, 'amount': 250},
+                {'id': added.id, 'amount': 50},
+            ],
+        }, format='json')
+    assert response.status_code == 200
+    assert amounts(recipe) == {kept.name: 100, changed.name: 250,
+                               added.name: 50}
+
+
+def test_unknown_ingredients_are_checked_in_one_query(recipe,
+                                                      author_client):
+    known = recipe.ingredients.first()
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [{'id': known.id, 'amount': 1},
+                            {'id': 999998, 'amount': 1},
+                            {'id': 999999, 'amount': 1}],
+        }, format='json')
+    assert response.status_code == 400
+    assert '[999998, 999999]' in str(response.data['ingredients'])
+    ingredient_queries = [
+        query for query in queries.captured_queries
+        if 'FROM "recipes_ingredient"' in query['sql']
+    ]
+    assert len(ingredient_queries) == 1
+
+
+def test_update_bumps_cart_versions(recipe, user, author_client):
+    ShoppingList.objects.create(user=user, recipe=recipe)
+    version = get_cart_version(user.id)
+    ingredient = recipe.ingredients.first()
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        author_client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [{'id': ingredient.id, 'amount': 1}],
+        }, format='json')
+    assert get_cart_version(user.id) != version
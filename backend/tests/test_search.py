@@ -0,0 +1,63 @@
+import pytest
+
+from recipes.models import Recipe
+from recipes.search import get_recipe_search
+from users.models import User
+
+
+@pytest.fixture
+def soups(db):
+    """Пять рецептов автора, за которыми следуют 210 таких же чужих."""
+    authors = [
+        User.objects.create_user(username=name, email=f'{name}@example.com',
+                                 password='pass')
+        for name in ('first', 'second')
+    ]
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Борщ {author.username} {number}',
+               text='Суп', cooking_time=60, image='recipes/test.png')
+        for author, count in zip(authors, (5, 210))
+        for number in range(count)
+    )
+    get_recipe_search().index()
+    return authors
+
+
+def test_search_applies_filters_to_all_matches(soups, anonymous_client):
+    response = anonymous_client.get('/api/recipes/', {
+        'search': 'борщ', 'author': soups[0].id,
+    })
+    assert response.status_code == 200
+    assert response.data['count'] == 5
+
+
+def test_search_pages_past_every_match(soups, anonymous_client):
+    response = anonymous_client.get('/api/recipes/', {
+        'search': 'борщ', 'limit': 100, 'page': 3,
+    })
+    assert response.status_code == 200
+    assert response.data['count'] == 215
+    assert len(response.data['results']) == 15
+
+
+def test_search_ranks_name_matches_first(soups, anonymous_client):
+    author = soups[0]
+    recipe = Recipe.objects.create(author=author, name='Солянка',
+                                   text='Вместо борща', cooking_time=60,
+                                   image='recipes/test.png')
+    get_recipe_search().index([recipe.id])
+    response = anonymous_client.get('/api/recipes/', {
+        'search': 'борщ', 'author': author.id,
+    })
+    names = [item['name'] for item in response.data['results']]
+    assert names[-1] == 'Солянка'
+    assert len(names) == 6
+
+
+@pytest.mark.parametrize('client_fixture', ['anonymous_client',
+                                            'user_client'])
+def test_search_rejects_cursor(client_fixture, request, soups):
+    client = request.getfixturevalue(client_fixture)
+    response = client.get('/api/recipes/', {'search': 'борщ', 'cursor': ''})
+    assert response.status_code == 400
+    assert 'cursor' in response.data
@@ -0,0 +1,50 @@
+import pytest
+from django.core.cache import caches
+
+from recipes.cart import CART_KEY, aggregate_cart, get_cart_version
+from recipes.exporters import EXPORTERS, ShoppingCartExporter
+from recipes.models import ShoppingList
+
+
+def test_exporter_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingCartExporter()
+
+
+@pytest.mark.parametrize('exporter', EXPORTERS)
+def test_download_streams_every_format(exporter, make_recipes, user,
+                                       user_client):
+    for recipe in make_recipes(2):
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    response = user_client.get('/api/recipes/download_shopping_cart/',
+                               {'format': exporter.format})
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'].startswith(exporter.media_type)
+    content = b''.join(response.streaming_content)
+    if exporter.format != 'pdf':
+        assert 'ингредиент 0'.encode() in content
+        assert b'200' in content
+
+
+@pytest.mark.parametrize('exporter', EXPORTERS)
+def test_download_errors_are_json(exporter, anonymous_client):
+    response = anonymous_client.get('/api/recipes/download_shopping_cart/',
+                                    {'format': exporter.format})
+    assert response.status_code == 401
+    assert response['Content-Type'] == 'application/json'
+    assert 'detail' in response.json()
+
+
+def test_repeated_download_is_served_from_cache(
+        make_recipes, user, user_client, django_assert_num_queries):
+    ShoppingList.objects.create(user=user, recipe=make_recipes(1)[0])
+    key = CART_KEY.format(user_id=user.id,
+                          version=get_cart_version(user.id))
+    url = '/api/recipes/download_shopping_cart/'
+    first = b''.join(user_client.get(url).streaming_content)
+    assert caches['shopping_cart'].get(key) == list(aggregate_cart(user.id))
+    # Остается только проверка токена.
+    with django_assert_num_queries(1):
+        response = user_client.get(url)
+        assert b''.join(response.streaming_content) == first
@@ -0,0 +1,64 @@
+import pytest
+
+
+def result_ids(response):
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_multiple_tags_return_each_recipe_once(make_recipes, tags,
+                                               anonymous_client):
+    recipes = make_recipes(3)
+    response = anonymous_client.get('/api/recipes/', {
+        'tags': ['breakfast', 'lunch', 'dinner'],
+    })
+    assert response.status_code == 200
+    assert response.data['count'] == 3
+    assert sorted(result_ids(response)) == sorted(
+        recipe.id for recipe in recipes
+    )
+
+
+def test_tags_match_any_or_all(make_recipes, tags, anonymous_client):
+    breakfast, lunch, _ = tags
+    both = make_recipes(1, recipe_tags=[breakfast, lunch])
+    only_lunch = make_recipes(1, recipe_tags=[lunch])
+    make_recipes(1, recipe_tags=[])
+    response = anonymous_client.get('/api/recipes/', {
+        'tags': ['breakfast', 'lunch'],
+    })
+    assert sorted(result_ids(response)) == sorted(
+        recipe.id for recipe in both + only_lunch
+    )
+    response = anonymous_client.get('/api/recipes/', {
+        'tags': ['BREAKFAST', 'lunch'], 'all_tags': 1,
+    })
+    assert result_ids(response) == [both[0].id]
+
+
+@pytest.mark.parametrize('params', [
+    {'tags': 'unknown'},
+    {'tags': 'unknown', 'cursor': ''},
+    {'tags': ['breakfast', 'unknown'], 'all_tags': 1, 'cursor': ''},
+])
+def test_unknown_tags_return_nothing(params, make_recipes,
+                                     anonymous_client):
+    make_recipes(2)
+    response = anonymous_client.get('/api/recipes/', params)
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
+@pytest.mark.parametrize('count', [1, 10])
+def test_tag_filter_query_count_is_fixed(count, make_recipes, tags,
+                                         anonymous_client,
+                                         django_assert_num_queries):
+    make_recipes(count)
+    params = {'tags': [tag.slug for tag in tags], 'limit': count}
+    # Первый запрос загружает соответствие slug -> id тегов.
+    anonymous_client.get('/api/recipes/', params)
+    # Число рецептов, страница, теги, авторы и ингредиенты.
+    with django_assert_num_queries(5):
+        response = anonymous_client.get('/api/recipes/', {
+            **params, 'page': 1,
+        })
+    assert len(response.data['results']) == count
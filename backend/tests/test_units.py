@@ -0,0 +1,50 @@
+import pytest
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingList
+
+
+@pytest.fixture
+def cart_with(user):
+    """Кладет в список покупок по рецепту на каждый ингредиент."""
+    def fill(*items):
+        for number, (name, unit, amount) in enumerate(items):
+            recipe = Recipe.objects.create(
+                author=user, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipes/test.png',
+            )
+            ingredient, _ = Ingredient.objects.get_or_create(
+                name=name, measurement_unit=unit
+            )
+            RecipeIngredient.objects.create(recipe=recipe,
+                                            ingredient=ingredient,
+                                            amount=amount)
+            ShoppingList.objects.create(user=user, recipe=recipe)
+    return fill
+
+
+def get_cart(client):
+    summary = client.get('/api/recipes/shopping_cart/summary/')
+    download = client.get('/api/recipes/download_shopping_cart/',
+                          {'format': 'txt'})
+    lines = b''.join(download.streaming_content).decode().splitlines()
+    return [
+        (item['name'], item['amount'], item['measurement_unit'])
+        for item in summary.data
+    ], [line.strip() for line in lines]
+
+
+def test_convertible_units_are_merged(cart_with, user_client):
+    cart_with(('мука', 'г', 300), ('мука', 'кг', 2))
+    summary, download = get_cart(user_client)
+    assert summary == [('мука', 2300, 'г')]
+    assert download == ['мука - 2300 г']
+
+
+def test_unconvertible_units_stay_separate(cart_with, user_client):
+    cart_with(('соль', 'г', 10), ('соль', 'по вкусу', 1),
+              ('соль', 'шт.', 2), ('соль', 'шт.', 3))
+    summary, download = get_cart(user_client)
+    assert summary == [
+        ('соль', 10, 'г'), ('соль', 1, 'по вкусу'), ('соль', 5, 'шт.'),
+    ]
+    assert download == ['соль - 10 г', 'соль - 1 по вкусу', 'соль - 5 шт.']
@@ -6,7 +6,8 @@ from .models import Follow, User
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = (
-        'pk', 'username', 'email', 'first_name', 'last_name', 'password'
+        'pk', 'username', 'email', 'first_name', 'last_name', 'password',
+        'recipes_count', 'followers_count'
     )
     list_filter = ('username', 'email')
     search_fields = ('username', 'email')
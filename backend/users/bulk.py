@@ -0,0 +1,53 @@
+from django.db.models import Exists, OuterRef
+from rest_framework import serializers
+
+from .counters import count_of
+
+MAX_BULK_ITEMS = 100
+
+CREATED = 'created'
+EXISTS = 'exists'
+NOT_FOUND = 'not_found'
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_ITEMS,
+    )
+
+
+def bulk_add(model, owner, target_field, targets, ids, counter=None,
+             errors=None):
+    """Создает связи owner с объектами targets из ids одной вставкой.
+
+    Сигналы при bulk_create не отправляются, поэтому счетчик counter
+    у добавленных объектов пересчитывается здесь же.
+    Возвращает статусы по каждому id и список добавленных id.
+    """
+    errors = errors or {}
+    ids = list(dict.fromkeys(ids))
+    links = model.objects.filter(user=owner, **{target_field: OuterRef('pk')})
+    found = dict(targets.filter(
+        pk__in=[pk for pk in ids if pk not in errors]
+    ).annotate(linked=Exists(links)).values_list('pk', 'linked'))
+    created = [pk for pk in ids if pk in found and not found[pk]]
+    model.objects.bulk_create(
+        [model(user=owner, **{f'{target_field}_id': pk}) for pk in created],
+        ignore_conflicts=True,
+    )
+    if counter and created:
+        targets.model.objects.filter(pk__in=created).update(
+            **{counter: count_of(model, target_field)}
+        )
+    results = []
+    for pk in ids:
+        if pk in errors:
+            status = errors[pk]
+        elif pk not in found:
+            status = NOT_FOUND
+        else:
+            status = EXISTS if found[pk] else CREATED
+        results.append({'id': pk, 'status': status})
+    return results, created
@@ -0,0 +1,35 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(queryset, field, delta):
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def reconcile_counters(queryset, counters, batch_size):
+    """Пересчитывает счетчики пачками по первичному ключу.
+
+    Возвращает количество обработанных строк.
+    """
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    processed = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return processed
+        queryset.model.objects.filter(pk__in=batch).update(**{
+            field: count_of(model, related_field)
+            for field, (model, related_field) in counters.items()
+        })
+        processed += len(batch)
+        last_id = batch[-1]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.5 on 2026-10-18 02:29
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_following_count(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    User.objects.update(following_count=Coalesce(Subquery(
+        Follow.objects.filter(user=OuterRef('pk')).order_by().values(
+            'user'
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписок'),
+        ),
+        migrations.RunPython(fill_following_count, migrations.RunPython.noop),
+    ]
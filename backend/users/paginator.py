@@ -1,6 +1,127 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db import connection
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    """Оценка числа строк из статистики планировщика PostgreSQL.
+
+    Есть только для таблицы без фильтров, иначе None: точный COUNT(*)
+    на каждый запрос и есть то, от чего избавляет курсор.
+    """
+    query = queryset.query
+    if query.is_empty():
+        return 0
+    if connection.vendor != 'postgresql' or query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row and row[0] >= 0:
+        return row[0]
+    return None
 
 
 class CustomPageNumberPaginator(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    cursor_only = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (self.cursor_only
+                            or self.cursor_query_param in request.query_params)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        position, reverse = self.decode_cursor(request)
+        self.count = approximate_count(queryset)
+        if reverse:
+            page = queryset.order_by('id')
+            if position is not None:
+                page = page.filter(id__gt=position)
+        else:
+            page = queryset.order_by('-id')
+            if position is not None:
+                page = page.filter(id__lt=position)
+        results = list(page[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.first_id = results[0].id if results else position
+        self.last_id = results[-1].id if results else position
+        return results
+
+    def get_count(self):
+        if self.cursor_mode:
+            return self.count
+        return self.page.paginator.count
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            position, _, reverse = b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').partition(':')
+            return int(position), reverse == 'r'
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        value = f'{position}:r' if reverse else str(position)
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param,
+            b64encode(value.encode('ascii')).decode('ascii')
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or self.last_id is None:
+            return None
+        return self.encode_cursor(self.last_id, reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or self.first_id is None:
+            return None
+        return self.encode_cursor(self.first_id, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class CursorPaginator(CustomPageNumberPaginator):
+    """Только курсорная пагинация, номера страниц не поддерживаются."""
+    cursor_only = True
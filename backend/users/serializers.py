@@ -2,11 +2,26 @@ from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
+from recipes.fields import RecipeImageField
+from recipes.membership import FOLLOWING, is_member
 from recipes.models import Recipe
 from .models import Follow
 
 User = get_user_model()
 
+MAX_RECIPES_LIMIT = 100
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return MAX_RECIPES_LIMIT
+    if not recipes_limit.isdigit():
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Значение должно быть неотрицательным числом'}
+        )
+    return min(int(recipes_limit), MAX_RECIPES_LIMIT)
+
 
 class UserRegistrationSerializer(UserCreateSerializer):
     class Meta(UserCreateSerializer.Meta):
@@ -23,11 +38,7 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=self.context['request'].user,
-                                     author=obj).exists()
+        return is_member(self.context.get('request'), FOLLOWING, obj.id)
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -51,9 +62,12 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class FollowingRecipesSerializers(serializers.ModelSerializer):
+    image = RecipeImageField('card')
+    images = RecipeImageField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class ShowFollowSerializer(serializers.ModelSerializer):
@@ -70,21 +84,17 @@ class ShowFollowSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return obj.follower.filter(user=obj, author=request.user).exists()
+        return is_member(self.context.get('request'), FOLLOWING, obj.id)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:(int(recipes_limit))]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
         else:
-            recipes = obj.recipes.all()
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         context = {'request': request}
         return FollowingRecipesSerializers(recipes, many=True,
                                            context=context).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
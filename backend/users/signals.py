@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .counters import change_counter
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'followers_count', 1)
+        change_counter(User.objects.filter(pk=instance.user_id),
+                       'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counter(User.objects.filter(pk=instance.author_id),
+                   'followers_count', -1)
+    change_counter(User.objects.filter(pk=instance.user_id),
+                   'following_count', -1)
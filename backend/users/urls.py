@@ -1,7 +1,7 @@
 from django.urls import include, path
 from djoser.views import TokenCreateView, TokenDestroyView
 
-from .views import FollowApiView, ListFollowViewSet
+from .views import BulkFollowApiView, FollowApiView, ListFollowViewSet
 
 urlpatterns = [
 
@@ -13,6 +13,9 @@ urlpatterns = [
          FollowApiView.as_view(),
          name='subscribe'
          ),
+    path('users/subscribe/bulk/', BulkFollowApiView.as_view(),
+         name='subscribe_bulk'
+         ),
     path('users/subscriptions/', ListFollowViewSet.as_view(),
          name='subscription'
          ),
@@ -1,12 +1,20 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .bulk import BulkIdsSerializer, bulk_add
+from .counters import count_of
 from .models import Follow
-from .serializers import FollowSerializer, ShowFollowSerializer
 from .paginator import CustomPageNumberPaginator
+from .serializers import (FollowSerializer, ShowFollowSerializer,
+                          get_recipes_limit)
+from recipes.feed import rebuild_feed
+from recipes.membership import FOLLOWING, update_members
+from recipes.models import Recipe
 
 User = get_user_model()
 
@@ -35,6 +43,28 @@ class FollowApiView(APIView):
             )
 
 
+class BulkFollowApiView(APIView):
+    permission_classes = [permissions.IsAuthenticated, ]
+
+    def post(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            results, created = bulk_add(
+                Follow, request.user, 'author', User.objects.all(),
+                serializer.validated_data['ids'], 'followers_count',
+                errors={request.user.id: 'self'},
+            )
+            if created:
+                User.objects.filter(pk=request.user.id).update(
+                    following_count=count_of(Follow, 'user')
+                )
+                user_id = request.user.id
+                transaction.on_commit(lambda: rebuild_feed(user_id))
+            update_members(FOLLOWING, request.user.id, added=created)
+        return Response({'results': results})
+
+
 class ListFollowViewSet(generics.ListAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated, ]
@@ -43,4 +73,16 @@ class ListFollowViewSet(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following__user=user)
\ No newline at end of file
+        return User.objects.filter(following__user=user).order_by('username')
+
+    def paginate_queryset(self, queryset):
+        recipes_limit = get_recipes_limit(self.request)
+        authors = super().paginate_queryset(queryset)
+        if authors is not None:
+            recipes = Recipe.objects.latest_for_authors(
+                [author.id for author in authors], recipes_limit
+            ).order_by('-id')
+            prefetch_related_objects(authors, Prefetch(
+                'recipes', queryset=recipes, to_attr='latest_recipes'
+            ))
+        return authors